@@ -0,0 +1,89 @@
+import atexit
+import threading
+import logging
+from typing import Optional
+import numpy as np
+import pyaudio
+from utils.ring_buffer import RingBuffer
+from .devices import get_device_registry
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureSession:
+    """Keeps an input device open and continuously captures into a ring buffer.
+
+    The stream is opened once, on the process-wide PortAudio instance owned
+    by the device registry, and reused for every recording, so a voice turn
+    needs no device setup. Because capture never stops, the ring always
+    holds the most recent audio and a turn can start with a pre-roll of
+    what was said just before it began.
+    """
+
+    def __init__(self, rate: int, channels: int = 1, chunk: int = 1024, ring_seconds: int = 10):
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self.format = pyaudio.paInt16
+        self.ring = RingBuffer(rate * ring_seconds, channels, np.int16)
+        self.device_index: Optional[int] = None
+        self.input_overflows = 0  # PortAudio-reported overflow events
+        self.registry = get_device_registry()
+        self._stream = None
+        self._lock = threading.Lock()
+        # A registry refresh re-initializes PortAudio, invalidating our stream
+        self.registry.add_refresh_listener(self.close)
+        atexit.register(self.close)
+
+    @property
+    def active(self) -> bool:
+        return self._stream is not None and self._stream.is_active()
+
+    def start(self, input_device_index: int):
+        """Open the device, or keep the running stream if it already uses it."""
+        with self._lock:
+            if self.active and self.device_index == input_device_index:
+                return
+            self._close_stream()
+            self._stream = self.registry.pyaudio.open(
+                format=self.format,
+                channels=self.channels,
+                rate=self.rate,
+                input=True,
+                input_device_index=input_device_index,
+                frames_per_buffer=self.chunk,
+                stream_callback=self._capture_callback
+            )
+            self.device_index = input_device_index
+            self.ring.clear()
+            logger.info(f"Capture session started on device {input_device_index}")
+
+    def begin_turn(self, preroll_ms: int = 0):
+        """Start consuming from `preroll_ms` before now and reset the overflow counters."""
+        self.ring.rewind(int(self.rate * preroll_ms / 1000))
+        self.ring.overflows = 0
+        self.input_overflows = 0
+
+    def read(self, max_frames: Optional[int] = None) -> np.ndarray:
+        return self.ring.read(max_frames)
+
+    def close(self):
+        with self._lock:
+            self._close_stream()
+
+    def _close_stream(self):
+        if self._stream is not None:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
+            except Exception:
+                pass
+            self._stream = None
+            self.device_index = None
+
+    def _capture_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio thread: copy into the ring buffer and return immediately."""
+        if status & pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        self.ring.write(np.frombuffer(in_data, dtype=np.int16))
+        return (None, pyaudio.paContinue)
@@ -0,0 +1,427 @@
+import io
+import threading
+import time
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+import soundfile as sf
+import ffmpeg
+from config.config import AUDIO_DECODER
+
+logger = logging.getLogger(__name__)
+
+try:
+    from scipy.signal import firwin, lfilter, resample_poly
+except ImportError:  # Linear interpolation is good enough for speech
+    resample_poly = None
+
+
+def resample(samples: np.ndarray, from_rate: int, to_rate: int) -> np.ndarray:
+    """Resample float audio along the first axis."""
+    if from_rate == to_rate or len(samples) == 0:
+        return samples
+    if resample_poly is not None:
+        divisor = np.gcd(from_rate, to_rate)
+        return resample_poly(samples, to_rate // divisor, from_rate // divisor, axis=0).astype(np.float32)
+    n = int(round(len(samples) * to_rate / from_rate))
+    positions = np.linspace(0, len(samples) - 1, n)
+    if samples.ndim == 1:
+        return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return np.stack([
+        np.interp(positions, np.arange(len(samples)), samples[:, c]) for c in range(samples.shape[1])
+    ], axis=1).astype(np.float32)
+
+
+class StreamResampler:
+    """Resamples consecutive mono blocks without seams at block boundaries.
+
+    A polyphase FIR whose filter state carries over from block to block
+    (linear interpolation when scipy is unavailable), so a stream can be
+    resampled piecewise as it is decoded.
+    """
+
+    def __init__(self, from_rate: int, to_rate: int, taps_per_phase: int = 16):
+        divisor = int(np.gcd(from_rate, to_rate))
+        self.up = to_rate // divisor
+        self.down = from_rate // divisor
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+        if resample_poly is not None and self.up != self.down:
+            factor = max(self.up, self.down)
+            self._taps = firwin(2 * taps_per_phase * factor + 1, 1.0 / factor, window=('kaiser', 5.0)) * self.up
+        self.reset()
+
+    def reset(self):
+        """Forget the history, e.g. after a seek."""
+        if resample_poly is not None and self.up != self.down:
+            self._zi = np.zeros(len(self._taps) - 1)
+        self._phase = 0          # Index of the next output sample in the upsampled signal
+        self._last = 0.0         # Linear fallback: previous input sample
+        self._position = 0.0     # Linear fallback: next output position in input samples
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.up == self.down or len(samples) == 0:
+            return samples.astype(np.float32)
+        if resample_poly is not None:
+            upsampled = np.zeros(len(samples) * self.up)
+            upsampled[::self.up] = samples
+            filtered, self._zi = lfilter(self._taps, 1.0, upsampled, zi=self._zi)
+            out = filtered[self._phase::self.down]
+            self._phase = (self._phase - len(upsampled)) % self.down
+            return out.astype(np.float32)
+        # Sample k of this block sits at position k, the previous block's last at -1
+        step = self.from_rate / self.to_rate
+        count = max(0, int(np.floor((len(samples) - 1 - self._position) / step)) + 1)
+        positions = self._position + step * np.arange(count)
+        out = np.interp(positions, np.arange(-1, len(samples)), np.concatenate(([self._last], samples)))
+        self._position += count * step - len(samples)
+        self._last = samples[-1]
+        return out.astype(np.float32)
+
+
+def mp3_supported() -> bool:
+    """Whether the installed libsndfile can decode MP3 (1.1.0 and later)."""
+    return 'MP3' in sf.available_formats()
+
+
+def decode_file(path: str, rate: Optional[int] = None, channels: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    """Decode an audio file to float32 frames, optionally mixed down and resampled.
+
+    Decodes in-process with libsndfile and only runs ffmpeg for formats it
+    cannot read. Returns `(samples, rate)` with samples shaped (frames, channels).
+    """
+    try:
+        samples, file_rate = sf.read(path, dtype='float32', always_2d=True)
+    except (sf.LibsndfileError, RuntimeError) as e:
+        if AUDIO_DECODER == 'soundfile':
+            raise
+        logger.debug(f"libsndfile cannot decode {path} ({e}), using ffmpeg")
+        return _ffmpeg_decode_file(path, rate, channels)
+
+    if channels == 1 and samples.shape[1] > 1:
+        samples = samples.mean(axis=1, keepdims=True)
+    if rate:
+        samples = resample(samples, file_rate, rate)
+        file_rate = rate
+    return samples, file_rate
+
+
+def _ffmpeg_decode_file(path: str, rate: Optional[int], channels: Optional[int]) -> Tuple[np.ndarray, int]:
+    if rate is None or channels is None:
+        info = ffmpeg.probe(path, select_streams='a')['streams'][0]
+        rate = rate or int(info['sample_rate'])
+        channels = channels or int(info['channels'])
+    out, _ = (
+        ffmpeg
+        .input(path)
+        .output('pipe:', format='f32le', acodec='pcm_f32le', ac=channels, ar=rate)
+        .run(capture_stdout=True, quiet=True)
+    )
+    return np.frombuffer(out, dtype=np.float32).reshape(-1, channels), rate
+
+
+class StreamDecoder:
+    """Incremental MP3 to mono float32 PCM decoder.
+
+    `write` and `finish` are called by the producer of MP3 data; `read` is
+    called by a single decoder thread and blocks until PCM is available,
+    returning None once the stream is exhausted or closed.
+    """
+
+    def __init__(self, samplerate: int):
+        self.samplerate = samplerate
+
+    def write(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def finish(self) -> None:
+        raise NotImplementedError
+
+    def read(self) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+
+# MPEG audio layer III frame header tables, indexed by the header's version bits
+_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG-2
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG-2.5
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+class SoundFileStreamDecoder(StreamDecoder):
+    """In-process MP3 stream decoding through libsndfile.
+
+    libsndfile has no incremental MP3 API, so each batch of new frames is
+    decoded on its own, after the last already decoded frames that hold
+    the bit reservoir and the synthesis overlap the batch depends on; the
+    samples of those overlap frames are dropped. Output matches a decode
+    of the whole stream, yet a read costs at most MAX_BATCH_SECONDS of new
+    frames plus the overlap, however long the stream grows. The first
+    overlap frames would borrow from data before the window: they are
+    rewritten to borrow only what the window holds and to decode as
+    silence, so mpg123 does not report them. Stream lengths are sized
+    from the frame size, which is exact for the constant-bitrate MP3
+    edge-tts produces.
+    """
+
+    MIN_FRAMES = 3          # mpg123 refuses one-frame streams
+    MAX_BATCH_SECONDS = 1.0
+    IDLE_SECONDS = 0.05     # Decode what is there once input pauses this long
+
+    def __init__(self, samplerate: int):
+        super().__init__(samplerate)
+        self._cond = threading.Condition()
+        self._pending = bytearray()       # Received but not yet parsed into frames
+        self._new: List[bytes] = []       # Frames not decoded yet
+        self._overlap: List[bytes] = []   # Decoded frames the next batch is decoded after
+        self._frame_samples = 576
+        self._rate: Optional[int] = None
+        self._last_write = 0.0
+        self._finished = False
+        self._closed = False
+        self._resampler: Optional[StreamResampler] = None
+
+    def write(self, data: bytes) -> None:
+        with self._cond:
+            self._pending += data
+            self._last_write = time.monotonic()
+            self._cond.notify()
+
+    def finish(self) -> None:
+        with self._cond:
+            self._finished = True
+            self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def read(self) -> Optional[np.ndarray]:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return None
+                self._parse()
+                if self._ready():
+                    max_batch = max(self.MIN_FRAMES, int(self.MAX_BATCH_SECONDS * self._rate / self._frame_samples))
+                    batch = self._new[:max_batch]
+                    del self._new[:len(batch)]
+                    overlap = self._overlap
+                    self._overlap = self._reservoir(overlap + batch)
+                    frame_samples = self._frame_samples
+                elif self._finished:
+                    return None
+                else:
+                    self._cond.wait(self.IDLE_SECONDS)
+                    continue
+            pcm = self._decode(overlap, batch, frame_samples)
+            if len(pcm):
+                return pcm
+
+    def _ready(self) -> bool:
+        new = len(self._new)
+        if new == 0:
+            return False
+        if self._finished:
+            return True
+        if len(self._overlap) + new < self.MIN_FRAMES:
+            return False
+        if time.monotonic() - self._last_write >= self.IDLE_SECONDS:
+            return True
+        # At least as many new frames as overlap ones, so decoding stays under twice one pass
+        return new >= len(self._overlap)
+
+    def _parse(self) -> None:
+        """Move complete frames from pending to the new frames."""
+        buf = self._pending
+        pos = 0
+        while pos + 4 <= len(buf):
+            if buf[pos:pos + 3] == b'ID3':
+                if pos + 10 > len(buf):
+                    break
+                size = (buf[pos + 6] << 21) | (buf[pos + 7] << 14) | (buf[pos + 8] << 7) | buf[pos + 9]
+                if pos + 10 + size > len(buf):
+                    break
+                pos += 10 + size
+                continue
+            header = self._frame_header(buf, pos)
+            if header is None:
+                pos += 1
+                continue
+            length, samples, rate = header
+            if pos + length > len(buf):
+                break
+            frame = bytes(buf[pos:pos + length])
+            pos += length
+            if b'Xing' in frame[:40] or b'Info' in frame[:40]:
+                continue  # VBR header frame, would make libsndfile trim the stream
+            self._new.append(frame)
+            self._frame_samples = samples
+            self._rate = rate
+        del buf[:pos]
+
+    @staticmethod
+    def _frame_header(buf, pos):
+        """(length, samples, rate) for a layer III frame header at `pos`.
+
+        Reads 4 bytes from `pos`; the caller makes sure they are there.
+        """
+        if buf[pos] != 0xFF or buf[pos + 1] & 0xE0 != 0xE0:
+            return None
+        version = (buf[pos + 1] >> 3) & 3
+        layer = (buf[pos + 1] >> 1) & 3
+        bitrate_index = buf[pos + 2] >> 4
+        rate_index = (buf[pos + 2] >> 2) & 3
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            return None
+        bitrate = _BITRATES[version][bitrate_index] * 1000
+        rate = _SAMPLE_RATES[version][rate_index]
+        padding = (buf[pos + 2] >> 1) & 1
+        if version == 3:
+            return 144 * bitrate // rate + padding, 1152, rate
+        return 72 * bitrate // rate + padding, 576, rate
+
+    @staticmethod
+    def _side_info(frame: bytes) -> Tuple[int, int, int]:
+        """(offset, length, main_data_begin) of a frame's side info."""
+        offset = 4 if frame[1] & 1 else 6  # After the CRC, if there is one
+        mono = frame[3] >> 6 == 3
+        if (frame[1] >> 3) & 3 == 3:
+            return offset, 17 if mono else 32, (frame[offset] << 1) | (frame[offset + 1] >> 7)
+        return offset, 9 if mono else 17, frame[offset]
+
+    @classmethod
+    def _main_data(cls, frame: bytes) -> int:
+        """Bytes a frame adds to the bit reservoir."""
+        offset, length, _ = cls._side_info(frame)
+        return len(frame) - offset - length
+
+    @classmethod
+    def _reservoir(cls, frames: List[bytes]) -> List[bytes]:
+        """The last two of `frames` (the synthesis filterbank carries a granule
+        over), after enough earlier ones to hold their bit reservoir."""
+        if not frames:
+            return []
+        # main_data_begin is 9 bits in MPEG-1, 8 in MPEG-2
+        needed = 511 if (frames[-1][1] >> 3) & 3 == 3 else 255
+        start = max(0, len(frames) - 2)
+        while start > 0 and needed > 0:
+            start -= 1
+            needed -= cls._main_data(frames[start])
+        return frames[start:]
+
+    @classmethod
+    def _silenced(cls, frame: bytes, begin: int) -> bytes:
+        """`frame` borrowing only `begin` reservoir bytes and decoding to silence."""
+        offset, _, _ = cls._side_info(frame)
+        bits = bytearray(frame)
+
+        def clear(start, count):
+            for bit in range(start, start + count):
+                bits[bit // 8] &= ~(0x80 >> bit % 8)
+
+        mono = frame[3] >> 6 == 3
+        channels = 1 if mono else 2
+        start = offset * 8
+        if (frame[1] >> 3) & 3 == 3:
+            bits[offset] = begin >> 1
+            bits[offset + 1] = (bits[offset + 1] & 0x7F) | (begin & 1) << 7
+            granules, first, size, scalefac_bits = 2, start + 9 + (5 if mono else 3) + 4 * channels, 59, 4
+        else:
+            bits[offset] = begin
+            granules, first, size, scalefac_bits = 1, start + 8 + (1 if mono else 2), 63, 9
+        for block in range(granules * channels):
+            # part2_3_length, big_values, global_gain and scalefac_compress
+            clear(first + block * size, 12 + 9 + 8 + scalefac_bits)
+        return bytes(bits)
+
+    def _decode(self, overlap: List[bytes], batch: List[bytes], frame_samples: int) -> np.ndarray:
+        """Decode `batch` after the `overlap` frames, returning only the batch's samples."""
+        window = []
+        available = 0  # Reservoir bytes mpg123 holds when it reaches the frame
+        for frame in overlap:
+            begin = self._side_info(frame)[2]
+            if begin > available:
+                # Keep the bytes it has, so the reservoir still builds up for the frames after it
+                frame = self._silenced(frame, available)
+                begin = available
+            window.append(frame)
+            available = begin + self._main_data(frame)
+        try:
+            pcm, rate = sf.read(io.BytesIO(b''.join(window + batch)), dtype='float32', always_2d=True)
+        except (sf.LibsndfileError, RuntimeError) as e:
+            # e.g. a stream of fewer than MIN_FRAMES, which mpg123 rejects
+            logger.debug(f"Dropping undecodable MP3 frames: {e}")
+            return np.zeros(0, dtype=np.float32)
+        start = len(overlap) * frame_samples
+        pcm = pcm[start:].mean(axis=1) if pcm.shape[1] > 1 else pcm[start:, 0]
+        if rate == self.samplerate:
+            return pcm
+        if self._resampler is None or self._resampler.from_rate != rate:
+            self._resampler = StreamResampler(rate, self.samplerate)
+        return self._resampler.process(pcm)
+
+
+class FFmpegStreamDecoder(StreamDecoder):
+    """MP3 stream decoding through an ffmpeg subprocess (fallback)."""
+
+    READ_BYTES = 4096
+
+    def __init__(self, samplerate: int):
+        super().__init__(samplerate)
+        self._process = (
+            ffmpeg
+            .input('pipe:', format='mp3', loglevel='error')
+            .output('pipe:', format='f32le', acodec='pcm_f32le',
+                   ac=1, ar=samplerate, hide_banner=None, nostats=None)
+            .run_async(pipe_stdin=True, pipe_stdout=True, quiet=True)
+        )
+        self._remainder = b''
+
+    def write(self, data: bytes) -> None:
+        # Blocks while ffmpeg's output is not being consumed
+        self._process.stdin.write(data)
+        self._process.stdin.flush()
+
+    def finish(self) -> None:
+        self._process.stdin.close()
+
+    def read(self) -> Optional[np.ndarray]:
+        try:
+            # read1 returns whatever is ready instead of waiting for a full block
+            data = self._process.stdout.read1(self.READ_BYTES)
+        except (OSError, ValueError):
+            return None  # Pipe closed by close()
+        if not data:
+            return None
+        data = self._remainder + data
+        usable = len(data) // 4 * 4
+        self._remainder = data[usable:]
+        return np.frombuffer(data[:usable], dtype=np.float32)
+
+    def close(self) -> None:
+        # Kill first so a writer blocked in write() gets EPIPE and releases stdin
+        self._process.kill()
+        try:
+            self._process.wait(timeout=2)
+        except Exception:
+            logger.warning("FFmpeg termination timed out")
+        try:
+            self._process.stdin.close()
+        except (OSError, ValueError):
+            pass
+
+
+def create_stream_decoder(samplerate: int) -> StreamDecoder:
+    """In-process decoder when libsndfile has MP3 support, else ffmpeg (see AUDIO_DECODER)."""
+    if AUDIO_DECODER != 'ffmpeg' and mp3_supported():
+        return SoundFileStreamDecoder(samplerate)
+    if AUDIO_DECODER == 'soundfile':
+        raise RuntimeError("libsndfile was built without MP3 support")
+    return FFmpegStreamDecoder(samplerate)
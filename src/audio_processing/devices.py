@@ -0,0 +1,158 @@
+import threading
+import logging
+from typing import Callable, Dict, List, Optional
+import pyaudio
+
+logger = logging.getLogger(__name__)
+
+ASOUND_CARDS = "/proc/asound/cards"
+
+
+class DeviceRegistry:
+    """Enumerates audio devices once and caches their capabilities.
+
+    PortAudio initialization is the expensive part of every device query, so
+    the registry keeps a single `PyAudio` instance for the whole process
+    (the capture session records through it too). Supported sample rates
+    are probed lazily per device and cached. The device list is only
+    rebuilt on `refresh()` or when the ALSA card list changes (hot-plug).
+    """
+
+    PROBE_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pa: Optional[pyaudio.PyAudio] = None
+        self._devices: Optional[List[Dict]] = None
+        self._probes: Dict[tuple, bool] = {}
+        self._signature = self._hotplug_signature()
+        self._refresh_listeners: List[Callable[[], None]] = []
+
+    @property
+    def pyaudio(self) -> pyaudio.PyAudio:
+        with self._lock:
+            if self._pa is None:
+                self._pa = pyaudio.PyAudio()
+            return self._pa
+
+    def add_refresh_listener(self, callback: Callable[[], None]):
+        """Called before PortAudio is re-initialized, so open streams can be closed."""
+        self._refresh_listeners.append(callback)
+
+    def devices(self) -> List[Dict]:
+        """All devices with their basic capabilities (cached)."""
+        with self._lock:
+            signature = self._hotplug_signature()
+            if signature != self._signature:
+                logger.info("Audio hardware changed, refreshing device list")
+                self.refresh()
+            if self._devices is None:
+                p = self.pyaudio
+                self._devices = []
+                for i in range(p.get_device_count()):
+                    info = p.get_device_info_by_index(i)
+                    self._devices.append({
+                        'index': i,
+                        'name': info.get('name'),
+                        'host_api': info.get('hostApi'),
+                        'max_input_channels': info.get('maxInputChannels'),
+                        'max_output_channels': info.get('maxOutputChannels'),
+                        'default_rate': int(info.get('defaultSampleRate', 0))
+                    })
+            return self._devices
+
+    def input_devices(self, host_api: Optional[int] = None, physical_only: bool = False) -> List[Dict]:
+        devices = [d for d in self.devices() if d['max_input_channels'] > 0]
+        if host_api is not None:
+            devices = [d for d in devices if d['host_api'] == host_api]
+        if physical_only:
+            devices = [d for d in devices if 'hw:' in d['name'] or 'USB' in d['name']]
+        return devices
+
+    def get(self, index: int) -> Optional[Dict]:
+        for device in self.devices():
+            if device['index'] == index:
+                return device
+        return None
+
+    def supports(self, index: int, rate: int, channels: int = 1, fmt: int = pyaudio.paInt16) -> bool:
+        """Single cached probe of whether the device can capture with these parameters."""
+        key = (index, rate, channels, fmt)
+        with self._lock:
+            if key not in self._probes:
+                device = self.get(index)
+                if device is None or device['max_input_channels'] < channels:
+                    self._probes[key] = False
+                else:
+                    try:
+                        self._probes[key] = bool(self.pyaudio.is_format_supported(
+                            rate,
+                            input_device=index,
+                            input_channels=channels,
+                            input_format=fmt
+                        ))
+                    except ValueError:
+                        self._probes[key] = False
+            return self._probes[key]
+
+    def supported_rates(self, index: int, channels: int = 1) -> List[int]:
+        return [rate for rate in self.PROBE_RATES if self.supports(index, rate, channels)]
+
+    def resolve_input_device(self, preferred: Optional[int], rate: int, channels: int = 1) -> int:
+        """The preferred device if it can capture at `rate`, else the default, else any input."""
+        if preferred is not None:
+            if self.supports(preferred, rate, channels):
+                return preferred
+            logger.warning(f"Configured input device {preferred} is unavailable or cannot record at {rate}Hz")
+        try:
+            default = self.pyaudio.get_default_input_device_info()['index']
+            if self.supports(default, rate, channels):
+                return default
+        except IOError:
+            pass
+        for device in self.input_devices():
+            if self.supports(device['index'], rate, channels):
+                return device['index']
+        raise Exception("No working input device found")
+
+    def refresh(self):
+        """Re-initialize PortAudio so newly attached or removed devices are seen."""
+        with self._lock:
+            for callback in self._refresh_listeners:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.warning(f"Device refresh listener failed: {e}")
+            if self._pa is not None:
+                self._pa.terminate()
+                self._pa = None
+            self._devices = None
+            self._probes.clear()
+            self._signature = self._hotplug_signature()
+
+    def close(self):
+        with self._lock:
+            if self._pa is not None:
+                self._pa.terminate()
+                self._pa = None
+
+    @staticmethod
+    def _hotplug_signature() -> Optional[str]:
+        """Cheap fingerprint of attached sound cards (Linux only)."""
+        try:
+            with open(ASOUND_CARDS, 'r') as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+_registry: Optional[DeviceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_device_registry() -> DeviceRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DeviceRegistry()
+        return _registry
@@ -3,7 +3,9 @@ import os
 import platform
 import subprocess
 from pathlib import Path
+import soundfile as sf
 from config.config import VOICE_OUTPUTS_DIR
+from .decoders import decode_file
 
 def check_ffmpeg():
     """Check if FFmpeg is available in the system."""
@@ -32,6 +34,9 @@ def get_ffmpeg_path():
 def preprocess_audio(input_path: str, output_path: str) -> bool:
     """
     Preprocess the audio file to downsample to 16,000 Hz mono.
+
+    Decodes and resamples in-process; FFmpeg is only used for formats
+    libsndfile cannot read or write.
     """
     try:
         # Convert paths to absolute paths
@@ -41,6 +46,13 @@ def preprocess_audio(input_path: str, output_path: str) -> bool:
         # Ensure output directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
+        try:
+            samples, rate = decode_file(input_path, rate=16000, channels=1)
+            sf.write(output_path, samples, rate)
+            return True
+        except Exception as e:
+            print(f"In-process preprocessing failed ({e}), trying FFmpeg")
+
         # Check if FFmpeg is available
         if not check_ffmpeg():
             print("FFmpeg not found. Please ensure FFmpeg is installed and in your system PATH.")
@@ -1,8 +1,14 @@
 import pyaudio
-import wave
 import os
 import threading
+import time
+import numpy as np
 from config.config import AUDIO_CONFIG, RECORDINGS_DIR
+from .capture import CaptureSession
+from .devices import get_device_registry
+from .wav_writer import StreamingWavWriter
+from .vad import VADEndpointer
+from .recording import Recording
 
 class AudioRecorder:
     def __init__(self, output_directory=RECORDINGS_DIR):
@@ -12,23 +18,24 @@ class AudioRecorder:
         self.rate = 44100
         self.output_directory = output_directory
         self.input_device_index = AUDIO_CONFIG.get('input_device_index')
+        # Persistent input stream; its ring also gives headroom if the consumer stalls
+        self.session = CaptureSession(self.rate, self.channels, self.chunk, ring_seconds=10)
+        self.preroll_ms = AUDIO_CONFIG.get('preroll_ms', 300)
+        # Voice-activity endpointing: stop automatically once the speaker goes quiet
+        self.auto_stop = AUDIO_CONFIG.get('vad_auto_stop', True)
+        self.vad_hangover_ms = AUDIO_CONFIG.get('vad_hangover_ms', 800)
+        self.vad_threshold_db = AUDIO_CONFIG.get('vad_threshold_db', -45.0)
         
         if not os.path.exists(output_directory):
             os.makedirs(output_directory)
 
     def list_input_devices(self):
         try:
-            p = pyaudio.PyAudio()
-            info = p.get_host_api_info_by_index(0)
-            numdevices = info.get('deviceCount')
+            devices = get_device_registry().input_devices(host_api=0)
+            for device in devices:
+                print(f"Input Device id {device['index']} - {device['name']}")
             
-            devices_found = False
-            for i in range(0, numdevices):
-                if (p.get_device_info_by_host_api_device_index(0, i).get('maxInputChannels')) > 0:
-                    print(f"Input Device id {i} - {p.get_device_info_by_host_api_device_index(0, i).get('name')}")
-                    devices_found = True
-            
-            if not devices_found:
+            if not devices:
                 print("No input devices found! Please check your audio settings and permissions.")
                 print("You may need to:")
                 print("1. Install ALSA utils: sudo apt-get install alsa-utils")
@@ -38,120 +45,162 @@ class AudioRecorder:
         except Exception as e:
             print(f"Error listing audio devices: {e}")
             print("Try running: sudo apt-get install python3-pyaudio portaudio19-dev")
-        finally:
-            p.terminate()
 
-    def record_until_q(self, filename, input_device_index=None):
+    def record_until_q(self, filename, input_device_index=None, auto_stop=None):
+        """Record until Ctrl+C or, with auto_stop, until the VAD hears the end of speech."""
         try:
             # Ensure output directory exists
             os.makedirs(self.output_directory, exist_ok=True)
-            
-            p = pyaudio.PyAudio()
-            
-            # If no specific device is specified, try to find any working input device
-            if input_device_index is None:
-                for i in range(p.get_device_count()):
-                    device_info = p.get_device_info_by_index(i)
-                    if device_info.get('maxInputChannels') > 0:
-                        input_device_index = i
-                        break
-                if input_device_index is None:
-                    raise Exception("No working input device found")
 
-            print(f"Attempting to open stream with device {input_device_index}")
-            
-            stream = p.open(format=self.format,
-                          channels=self.channels,
-                          rate=self.rate,
-                          input=True,
-                          input_device_index=input_device_index,
-                          frames_per_buffer=self.chunk)
-
-            print("* recording")
-            print("Press Ctrl+C to stop recording")
-            frames = []
+            full_path = os.path.join(os.path.abspath(self.output_directory), filename)
+            print(f"Saving to directory: {os.path.dirname(full_path)}")
+            print(f"Full file path: {full_path}")
+            writer = self._open_writer(full_path)
 
-            while True:
+            try:
+                vad = self._capture_turn(lambda data: writer.write(data.tobytes()), input_device_index, auto_stop)
+            finally:
+                # Finalize the WAV header even if recording was interrupted
                 try:
-                    data = stream.read(self.chunk, exception_on_overflow=False)
-                    frames.append(data)
-                except KeyboardInterrupt:
-                    break
+                    writer.close()
                 except Exception as e:
-                    print(f"Warning: {e}")
-                    continue
+                    print(f"Error saving the recording: {str(e)}")
+                    raise
 
-            print("* done recording")
-            
-            # Ensure proper cleanup
-            try:
-                stream.stop_stream()
-                stream.close()
-            except:
-                pass
-            try:
-                p.terminate()
-            except:
-                pass
-
-            # Save the recording
-            try:
-                full_path = os.path.join(os.path.abspath(self.output_directory), filename)
-                print(f"Saving to directory: {os.path.dirname(full_path)}")
-                print(f"Full file path: {full_path}")
-                
-                wf = wave.open(full_path, 'wb')
-                wf.setnchannels(self.channels)
-                wf.setsampwidth(p.get_sample_size(self.format))
-                wf.setframerate(self.rate)
-                wf.writeframes(b''.join(frames))
-                wf.close()
-                print(f"Successfully saved recording to {full_path}")
-                return full_path
-            except Exception as e:
-                print(f"Error saving the recording: {str(e)}")
-                raise
+            if vad and not vad.started:
+                print("Warning: no speech detected")
+            print(f"Successfully saved recording to {full_path}")
+            return full_path
 
         except Exception as e:
             print(f"An error occurred: {str(e)}")
             raise
 
-    def record(self, duration, filename, input_device_index=None):
-        p = pyaudio.PyAudio()
+    def record_turn(self, input_device_index=None, auto_stop=None) -> Recording:
+        """Record one voice turn into memory, ready to hand straight to STT.
+
+        The turn is bounded by the VAD endpoint (or Ctrl+C), so holding it in
+        RAM is cheap; `get_recordings_archive().add_recording` keeps a compressed copy on disk.
+        """
+        chunks = []
+        vad = self._capture_turn(chunks.append, input_device_index, auto_stop)
+        if vad and not vad.started:
+            print("Warning: no speech detected")
+        samples = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int16)
+        return Recording(samples.ravel(), self.rate, self.channels)
+
+    def _capture_turn(self, sink, input_device_index=None, auto_stop=None):
+        """Feed one turn of captured int16 audio to `sink`; returns the VAD used, if any."""
+        if auto_stop is None:
+            auto_stop = self.auto_stop
+
+        # Reuses the open input stream; the turn starts with the pre-roll
+        self.start_capture(input_device_index)
+        self.session.begin_turn(self.preroll_ms)
+        vad = self._new_vad() if auto_stop else None
+
+        print("* recording")
+        if vad:
+            print("Recording stops when you finish speaking (or press Ctrl+C)")
+        else:
+            print("Press Ctrl+C to stop recording")
 
+        try:
+            while not (vad and vad.ended):
+                try:
+                    if not self._drain(sink, vad=vad):
+                        time.sleep(self.chunk / self.rate / 2)
+                except KeyboardInterrupt:
+                    break
+        finally:
+            print("* done recording")
+            self._drain(sink, vad=vad)
+            if vad:
+                tail = vad.flush()
+                if len(tail):
+                    sink(tail)
+            self._report_overflows()
+        return vad
+
+    def record(self, duration, filename, input_device_index=None):
         if input_device_index is None:
-            input_device_index = p.get_default_input_device_info()['index']
+            input_device_index = self.session.registry.pyaudio.get_default_input_device_info()['index']
 
-        stream = p.open(format=self.format,
-                        channels=self.channels,
-                        rate=self.rate,
-                        input=True,
-                        input_device_index=input_device_index,
-                        frames_per_buffer=self.chunk)
+        self.start_capture(input_device_index)
+        self.session.begin_turn()
 
         print(f"* Recording from device {input_device_index} for {duration} seconds.")
 
-        frames = []
-
-        for i in range(0, int(self.rate / self.chunk * duration)):
-            data = stream.read(self.chunk)
-            frames.append(data)
+        file_path = os.path.join(self.output_directory, filename)
+        writer = self._open_writer(file_path)
+        remaining = int(self.rate * duration)
 
-        print("* Done recording")
+        try:
+            while remaining > 0:
+                drained = self._drain(lambda data: writer.write(data.tobytes()), remaining)
+                remaining -= drained
+                if not drained:
+                    time.sleep(self.chunk / self.rate / 2)
+        finally:
+            print("* Done recording")
+            writer.close()
+            self._report_overflows()
 
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
+        return file_path
 
-        file_path = os.path.join(self.output_directory, filename)
-        wf = wave.open(file_path, 'wb')
-        wf.setnchannels(self.channels)
-        wf.setsampwidth(p.get_sample_size(self.format))
-        wf.setframerate(self.rate)
-        wf.writeframes(b''.join(frames))
-        wf.close()
+    def start_capture(self, input_device_index=None):
+        """Open the input device once and keep capturing in the background.
 
-        return file_path
+        Starting ahead of the first turn lets that turn use the pre-roll too.
+        """
+        if input_device_index is None:
+            if self.session.active:
+                return
+            # Configured device if a single cached probe accepts it, else any working input
+            input_device_index = self.session.registry.resolve_input_device(
+                self.input_device_index, self.rate, self.channels
+            )
+
+        if not (self.session.active and self.session.device_index == input_device_index):
+            print(f"Attempting to open stream with device {input_device_index}")
+        self.session.start(input_device_index)
+
+    def close(self):
+        """Release the input device."""
+        self.session.close()
+
+    def _drain(self, sink, max_frames=None, vad=None):
+        """Move captured frames from the ring buffer to `sink`; returns frames consumed.
+
+        With a VAD, only the audio it keeps (speech plus padding) is passed on.
+        """
+        data = self.session.read(max_frames)
+        kept = vad.process(data) if vad is not None and len(data) else data
+        if len(kept):
+            sink(kept)
+        return len(data)
+
+    def _new_vad(self):
+        return VADEndpointer(
+            self.rate,
+            threshold_db=self.vad_threshold_db,
+            hangover_ms=self.vad_hangover_ms
+        )
+
+    def _report_overflows(self):
+        session = self.session
+        if session.input_overflows or session.ring.overflows:
+            print(f"Warning: {session.input_overflows} input overflows reported by the device, "
+                  f"{session.ring.overflows} frames dropped by the capture buffer")
+
+    def _open_writer(self, path):
+        """Start a background writer that streams frames straight to disk."""
+        return StreamingWavWriter(
+            path,
+            channels=self.channels,
+            sample_width=pyaudio.get_sample_size(self.format),
+            rate=self.rate
+        ).start()
 
     def record_and_transcribe(self, duration, filename, transcription_api):
         file_path = self.record(duration, filename)
@@ -0,0 +1,57 @@
+import io
+import os
+import uuid
+import wave
+from datetime import datetime
+from typing import Optional
+import numpy as np
+
+
+class Recording:
+    """A captured voice turn held in memory as int16 PCM.
+
+    Encoded WAV bytes are produced on demand (and cached) for upload, so the
+    STT layer never needs a file on disk. Archiving to disk is optional and
+    happens on a background thread under a unique name.
+    """
+
+    def __init__(self, samples: np.ndarray, rate: int, channels: int = 1):
+        self.samples = np.asarray(samples, dtype=np.int16)
+        self.rate = rate
+        self.channels = channels
+        self.created = datetime.now()
+        self.id = uuid.uuid4().hex[:8]
+        self.path: Optional[str] = None  # Set once archived
+        self._wav_bytes: Optional[bytes] = None
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.channels / self.rate
+
+    @property
+    def filename(self) -> str:
+        return f"input_{self.created.strftime('%Y%m%d_%H%M%S')}_{self.id}.wav"
+
+    def __len__(self):
+        return len(self.samples)
+
+    def to_wav_bytes(self) -> bytes:
+        """Encode as a WAV file in memory."""
+        if self._wav_bytes is None:
+            buf = io.BytesIO()
+            with wave.open(buf, 'wb') as wf:
+                wf.setnchannels(self.channels)
+                wf.setsampwidth(2)
+                wf.setframerate(self.rate)
+                wf.writeframes(self.samples.tobytes())
+            self._wav_bytes = buf.getvalue()
+        return self._wav_bytes
+
+    def save(self, directory: str) -> str:
+        """Write the WAV to `directory` under a unique name and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.filename)
+        with open(path, 'wb') as f:
+            f.write(self.to_wav_bytes())
+        self.path = path
+        return path
@@ -0,0 +1,122 @@
+from collections import deque
+from typing import Optional
+import numpy as np
+
+
+class VADEndpointer:
+    """Energy / zero-crossing voice activity detector that endpoints a recording.
+
+    Audio is classified in short frames; features for every frame of a chunk
+    are computed in one vectorized pass. Recording is considered started
+    after `min_speech_ms` of speech and ended after `hangover_ms` of silence.
+    `process` returns only the audio worth keeping: leading silence is
+    dropped (except `pad_ms` before speech) and trailing silence is held back
+    until speech resumes, so at most `pad_ms` of it survives the endpoint.
+    """
+
+    def __init__(
+        self,
+        rate: int,
+        frame_ms: int = 20,
+        threshold_db: float = -45.0,
+        noise_margin_db: float = 10.0,
+        zcr_max: float = 0.25,
+        min_speech_ms: int = 120,
+        hangover_ms: int = 800,
+        pad_ms: int = 150,
+        max_initial_silence_ms: Optional[int] = 10000
+    ):
+        self.frame = max(1, int(rate * frame_ms / 1000))
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.zcr_max = zcr_max
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.pad_frames = pad_ms // frame_ms
+        self.max_initial_frames = max_initial_silence_ms // frame_ms if max_initial_silence_ms else None
+
+        self.noise_floor_db: Optional[float] = None
+        self.started = False
+        self.ended = False
+        self.timed_out = False  # Ended without ever hearing speech
+        self._leftover = np.empty(0, dtype=np.int16)
+        self._preroll = deque(maxlen=self.pad_frames + self.min_speech_frames)
+        self._pending = []
+        self._speech_run = 0
+        self._silence_run = 0
+        self._frames_seen = 0
+
+    def frame_features(self, frames: np.ndarray):
+        """Per-frame level in dBFS and zero-crossing rate for a (n_frames, frame) int16 block."""
+        x = frames.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(x * x, axis=1)) + 1e-10
+        level_db = 20 * np.log10(rms)
+        signs = np.signbit(x)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+        return level_db, zcr
+
+    def classify(self, level_db: np.ndarray, zcr: np.ndarray) -> np.ndarray:
+        """Loud frames are speech; quieter ones only if their ZCR looks voiced."""
+        floor = self.noise_floor_db if self.noise_floor_db is not None else level_db.min(initial=0.0)
+        threshold = max(self.threshold_db, floor + self.noise_margin_db)
+        return (level_db > threshold + 10) | ((level_db > threshold) & (zcr < self.zcr_max))
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Feed captured int16 samples; returns the trimmed audio to keep."""
+        if self.ended:
+            return np.empty(0, dtype=np.int16)
+        samples = np.concatenate((self._leftover, np.asarray(samples, dtype=np.int16).ravel()))
+        n_frames = len(samples) // self.frame
+        self._leftover = samples[n_frames * self.frame:]
+        if not n_frames:
+            return np.empty(0, dtype=np.int16)
+
+        frames = samples[:n_frames * self.frame].reshape(n_frames, self.frame)
+        level_db, zcr = self.frame_features(frames)
+        speech = self.classify(level_db, zcr)
+        self._update_noise_floor(level_db[~speech])
+
+        kept = []
+        for frame, is_speech in zip(frames, speech):
+            self._frames_seen += 1
+            if not self.started:
+                self._preroll.append(frame)
+                self._speech_run = self._speech_run + 1 if is_speech else 0
+                if self._speech_run >= self.min_speech_frames:
+                    self.started = True
+                    kept.extend(self._preroll)
+                    self._preroll.clear()
+                elif self.max_initial_frames and self._frames_seen >= self.max_initial_frames:
+                    self.ended = self.timed_out = True
+                    break
+            elif is_speech:
+                kept.extend(self._pending)
+                self._pending.clear()
+                kept.append(frame)
+                self._silence_run = 0
+            else:
+                self._pending.append(frame)
+                self._silence_run += 1
+                if self._silence_run >= self.hangover_frames:
+                    kept.extend(self._pending[:self.pad_frames])
+                    self._pending.clear()
+                    self.ended = True
+                    break
+        return np.concatenate(kept) if kept else np.empty(0, dtype=np.int16)
+
+    def flush(self) -> np.ndarray:
+        """Audio still held back when recording is stopped manually."""
+        if not self.started or self.ended:
+            return np.empty(0, dtype=np.int16)
+        tail = self._pending[:self.pad_frames]
+        self._pending.clear()
+        return np.concatenate(tail) if tail else np.empty(0, dtype=np.int16)
+
+    def _update_noise_floor(self, silence_db: np.ndarray):
+        if not len(silence_db):
+            return
+        level = float(np.median(silence_db))
+        if self.noise_floor_db is None:
+            self.noise_floor_db = level
+        else:
+            self.noise_floor_db = 0.95 * self.noise_floor_db + 0.05 * level
@@ -0,0 +1,95 @@
+import os
+import queue
+import threading
+import wave
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class StreamingWavWriter:
+    """Writes PCM chunks to a WAV file incrementally from a writer thread.
+
+    Producers hand chunks over through a bounded queue, so memory stays
+    constant regardless of recording length. `wave` patches the header
+    after every write, so a crash leaves a readable file with everything
+    flushed so far; `close()` finalizes it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        channels: int,
+        sample_width: int,
+        rate: int,
+        max_queued_chunks: int = 256,
+        flush_every: int = 32
+    ):
+        self.path = path
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        self.flush_every = flush_every
+        self.frames_written = 0
+        self._queue = queue.Queue(maxsize=max_queued_chunks)
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'StreamingWavWriter':
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="wav-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, data: bytes):
+        """Queue a chunk for writing; blocks only if the writer falls far behind."""
+        if self._error:
+            raise self._error
+        self._queue.put(data)
+
+    def close(self) -> str:
+        """Drain the queue, finalize the header and return the file path."""
+        if self._thread:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        if self._error:
+            raise self._error
+        return self.path
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        try:
+            with open(self.path, 'wb') as f:
+                wf = wave.open(f, 'wb')
+                wf.setnchannels(self.channels)
+                wf.setsampwidth(self.sample_width)
+                wf.setframerate(self.rate)
+                pending = 0
+                try:
+                    while True:
+                        data = self._queue.get()
+                        if data is _STOP:
+                            break
+                        wf.writeframes(data)
+                        self.frames_written += len(data) // (self.sample_width * self.channels)
+                        pending += 1
+                        if pending >= self.flush_every:
+                            f.flush()
+                            pending = 0
+                finally:
+                    wf.close()
+        except BaseException as e:
+            logger.error(f"WAV writer failed for {self.path}: {e}")
+            self._error = e
+            # Keep draining so producers never block on a dead writer
+            while self._queue.get() is not _STOP:
+                pass
@@ -20,6 +20,13 @@ load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# Account rate limits used to pace Groq requests (corrected from response headers)
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000"))
+
+# Latency percentile after which STT/LLM calls fire a hedged duplicate (0 disables)
+REQUEST_HEDGE_PERCENTILE = float(os.getenv("REQUEST_HEDGE_PERCENTILE", "95"))
+
 # Define the path for the config file
 CONFIG_FILE_PATH = os.path.join(os.path.dirname(__file__), 'audio_config.json')
 
@@ -40,3 +47,62 @@ VOICE_OUTPUTS_DIR = os.path.join(PROJECT_ROOT, '.voice_outputs')
 # Ensure directories exist
 os.makedirs(RECORDINGS_DIR, exist_ok=True)
 os.makedirs(VOICE_OUTPUTS_DIR, exist_ok=True)
+
+# Archive quotas for recordings and TTS outputs (oldest/least-recently-used files go first)
+RECORDINGS_ARCHIVE_CODEC = os.getenv("RECORDINGS_ARCHIVE_CODEC", "flac")  # flac, opus or empty for WAV
+RECORDINGS_MAX_MB = int(os.getenv("RECORDINGS_MAX_MB", "500"))
+RECORDINGS_MAX_AGE_DAYS = float(os.getenv("RECORDINGS_MAX_AGE_DAYS", "30"))
+VOICE_OUTPUTS_MAX_MB = int(os.getenv("VOICE_OUTPUTS_MAX_MB", "200"))
+VOICE_OUTPUTS_MAX_AGE_DAYS = float(os.getenv("VOICE_OUTPUTS_MAX_AGE_DAYS", "7"))
+
+# Size cap for the content-addressed TTS cache in VOICE_OUTPUTS_DIR/tts_cache
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "100"))
+
+# How responses are spoken: "stream" pipes edge-tts chunks into playback as they arrive, "file" plays a finished file
+TTS_PLAYBACK_MODE = os.getenv("TTS_PLAYBACK_MODE", "stream")
+
+# Stream answers from the LLM token by token, speaking each sentence while the rest is generated ("0" waits for the full answer)
+LLM_STREAMING = os.getenv("LLM_STREAMING", "1") not in ("0", "false", "False")
+
+# Streamed playback buffering: audio decoded ahead before playback (re)starts, and how far decoding may run ahead
+STREAM_JITTER_MS = int(os.getenv("STREAM_JITTER_MS", "150"))
+STREAM_BUFFER_SECONDS = float(os.getenv("STREAM_BUFFER_SECONDS", "5"))
+
+# Longest stretch of a streamed answer kept decoded for seeking back and replay; longer answers keep only their latest part
+STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "300"))
+
+# MP3 decoding: "auto" decodes in-process when libsndfile supports MP3 and falls back to ffmpeg; "soundfile" or "ffmpeg" forces one
+AUDIO_DECODER = os.getenv("AUDIO_DECODER", "auto")
+
+# Rate of the shared playback output stream; file and streamed audio is resampled to it (edge-tts is 24 kHz)
+PLAYBACK_SAMPLERATE = int(os.getenv("PLAYBACK_SAMPLERATE", "24000"))
+
+# Memory cap for decoded PCM of recently played audio, used for instant replay
+PCM_CACHE_MAX_MB = int(os.getenv("PCM_CACHE_MAX_MB", "64"))
+
+# Share of wall time the playback panel may spend rendering; its refresh interval adapts to stay under it
+PLAYBACK_UI_CPU_BUDGET = float(os.getenv("PLAYBACK_UI_CPU_BUDGET", "0.02"))
+
+# RAG context assembly: chunks retrieved per query, and the prompt token budget they are trimmed to
+RAG_SIMILARITY_TOP_K = int(os.getenv("RAG_SIMILARITY_TOP_K", "6"))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1500"))
+
+# LLMs the router picks from, fastest first and most capable last, and the median latency (s) above which a model counts as degraded
+LLM_MODELS = [m.strip() for m in os.getenv("LLM_MODELS", "llama-3.1-8b-instant,llama-3.3-70b-specdec").split(",") if m.strip()]
+LLM_DEGRADED_LATENCY = float(os.getenv("LLM_DEGRADED_LATENCY", "8"))
+# Age (s) after which a latency sample no longer counts toward a model's health, so a demoted model gets retried
+LLM_LATENCY_WINDOW = float(os.getenv("LLM_LATENCY_WINDOW", "300"))
+
+# Conversation memory: turns kept verbatim (and their token cap), and the size of the rolling summary of older turns
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "3"))
+MEMORY_RECENT_TOKENS = int(os.getenv("MEMORY_RECENT_TOKENS", "1200"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "300"))
+# Similarity the previous turn's notes need to the new question for their retrieval to be reused
+MEMORY_REUSE_SIMILARITY = float(os.getenv("MEMORY_REUSE_SIMILARITY", "0.8"))
+
+# Semantic answer cache: cosine similarity at which a new question reuses a stored answer (0 disables), and the entries kept
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "200"))
+# Opt-in: file of common questions (one per line, e.g. prompts/PerguntasLusochat.txt) answered into the cache
+# in the background at startup. Its LLM/TTS calls share the rate limits with interactive turns.
+ANSWER_CACHE_WARM_FILE = os.getenv("ANSWER_CACHE_WARM_FILE", "")
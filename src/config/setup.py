@@ -1,31 +1,16 @@
 import os
 import sys
-import pyaudio
 import json
 from config.config import CONFIG_FILE_PATH, RECORDINGS_DIR
+from audio_processing.devices import get_device_registry
 
 # Add the project root to the Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
 def list_input_devices():
-    p = pyaudio.PyAudio()
-    info = p.get_host_api_info_by_index(0)
-    numdevices = info.get('deviceCount')
-    
-    devices = []
-    for i in range(0, numdevices):
-        device_info = p.get_device_info_by_host_api_device_index(0, i)
-        if (device_info.get('maxInputChannels')) > 0:
-            # Filter out non-physical devices
-            if 'hw:' in device_info.get('name') or 'USB' in device_info.get('name'):
-                devices.append({
-                    'index': i,
-                    'name': device_info.get('name')
-                })
-    
-    p.terminate()
-    return devices
+    devices = get_device_registry().input_devices(host_api=0, physical_only=True)
+    return [{'index': d['index'], 'name': d['name']} for d in devices]
 
 def setup_audio_device():
     devices = list_input_devices()
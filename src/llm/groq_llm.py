@@ -1,30 +1,182 @@
 from llama_index.llms.groq import Groq
 from llama_index.core.llms import ChatMessage
-from typing import List, Optional
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, TypeVar
+import asyncio
+import logging
+import re
+import threading
 import os
-from config.config import GROQ_API_KEY
+from config.config import GROQ_API_KEY, LLM_MODELS, LLM_DEGRADED_LATENCY, LLM_LATENCY_WINDOW
+from utils.groq_client import get_http_client
+from utils.request_policy import get_policy, is_retryable, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Questions asking for reasoning rather than a lookup (Portuguese and English)
+_COMPLEX_CUES = re.compile(
+    r"\b(por ?qu[eê]|como|compar\w*|explique|explica\w*|analis\w*|diferen\w*|vantage\w*|resum\w*|"
+    r"why|how|compare|explain|analy[sz]\w*|differen\w*|summar\w*|pros|cons|plan\w*)\b",
+    re.IGNORECASE
+)
+
+
+def estimate_complexity(query: str, retrieval_score: Optional[float] = None) -> float:
+    """0 for a short lookup with confident retrieval, 1 for a long reasoning question."""
+    score = min(len(query.split()) / 40, 0.4)
+    score += min(0.2 * len(_COMPLEX_CUES.findall(query)), 0.4)
+    if query.count('?') > 1:
+        score += 0.2
+    if retrieval_score is not None:
+        # Weak matches leave more for the model to work out
+        if retrieval_score < 0.5:
+            score += 0.3
+        elif retrieval_score > 0.8:
+            score -= 0.2
+    return min(max(score, 0.0), 1.0)
+
 
 class GroqLLMWrapper:
+    """Groq LLMs with latency-aware routing between the configured models.
+
+    `models` run from fastest to most capable. `route` picks the model whose
+    place in that list matches the query's estimated complexity, then
+    orders the others as fallbacks, demoting models that are degraded: an
+    open circuit breaker not yet due a trial call, or a median latency
+    above `degraded_latency` over the last `latency_window` seconds.
+    Each model has its own `RequestPolicy` ("llm:<model>"), so latency
+    history, hedging and breakers are tracked per model.
+    """
+
     def __init__(
         self,
-        model_name: str = "llama-3.3-70b-specdec",
-        temperature: float = 0.1
+        models: Optional[List[str]] = None,
+        temperature: float = 0.1,
+        degraded_latency: float = LLM_DEGRADED_LATENCY,
+        latency_window: float = LLM_LATENCY_WINDOW
     ):
         if not GROQ_API_KEY:
             raise ValueError("GROQ_API_KEY not set in environment variables")
-        
-        self.llm = Groq(
-            model=model_name,
-            api_key=GROQ_API_KEY,
-            temperature=temperature
-        )
-        
-    def get_llm(self):
-        return self.llm
+
+        self.models = list(models or LLM_MODELS)
+        self.temperature = temperature
+        self.degraded_latency = degraded_latency
+        self.latency_window = latency_window
+        self.last_model: Optional[str] = None
+        self._llms: Dict[str, Groq] = {}
+        # The most capable model stays the default for callers that do not route
+        self.llm = self.get_llm(self.models[-1])
+
+    def get_llm(self, model: Optional[str] = None):
+        model = model or self.models[-1]
+        if model not in self._llms:
+            self._llms[model] = Groq(
+                model=model,
+                api_key=GROQ_API_KEY,
+                temperature=self.temperature,
+                # RequestPolicy is the only retry layer
+                max_retries=0,
+                http_client=get_http_client()
+            )
+        return self._llms[model]
+
+    def _degraded(self, model: str) -> bool:
+        policy = get_policy(f"llm:{model}")
+        # An open breaker due its trial call, or latencies that aged out, give a demoted model another go
+        if not policy.breaker.available():
+            return True
+        median = policy.latency.percentile(50, max_age=self.latency_window)
+        return median is not None and median > self.degraded_latency
+
+    def route(self, query: str, retrieval_score: Optional[float] = None) -> List[str]:
+        """Models to try for `query`, preferred first."""
+        tier = round(estimate_complexity(query, retrieval_score) * (len(self.models) - 1))
+        # Nearest tiers first; on a tie the more capable model
+        order = sorted(range(len(self.models)), key=lambda i: (abs(i - tier), -i))
+        ranked = [self.models[i] for i in order]
+        return sorted(ranked, key=self._degraded)  # Stable: healthy models keep their order
+
+    async def run(self, query: str, fn: Callable[..., T], retrieval_score: Optional[float] = None) -> T:
+        """Call `fn(llm)` with the routed model, failing over to the next one on transient errors."""
+        error = None
+        for model in self.route(query, retrieval_score):
+            try:
+                result = await get_policy(f"llm:{model}").run(fn, self.get_llm(model))
+            except Exception as e:
+                if not (isinstance(e, CircuitOpenError) or is_retryable(e)):
+                    raise
+                logger.warning(f"Model {model} unavailable ({e}), failing over")
+                error = e
+                continue
+            self.last_model = model
+            return result
+        raise error
 
     def chat(self, messages: List[ChatMessage]) -> str:
         try:
             response = self.llm.chat(messages)
             return response.message.content
         except Exception as e:
-            raise Exception(f"Error in Groq API call: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error in Groq API call: {str(e)}") from e
+
+    def stream_chat(self, messages: List[ChatMessage]) -> Iterator[str]:
+        """Yield the reply's text as it is generated."""
+        try:
+            for chunk in self.llm.stream_chat(messages):
+                if chunk.delta:
+                    yield chunk.delta
+        except Exception as e:
+            raise Exception(f"Error in Groq API call: {str(e)}") from e
+
+
+def prefetch_first(tokens: Iterator[str]) -> Iterator[str]:
+    """Pull the first token now and return a generator that yields it first.
+
+    Streams are lazy: the API request is only sent on the first `next`.
+    Calling this inside the function a RequestPolicy runs lets a stream
+    that fails to open be retried or failed over before any audio starts,
+    and counts time to first token in the model's latency.
+    """
+    tokens = iter(tokens)
+    try:
+        first = next(tokens)
+    except StopIteration:
+        return iter(())
+
+    def chained():
+        yield first
+        yield from tokens
+
+    return chained()
+
+
+async def iterate_in_thread(tokens: Iterator[str]) -> AsyncIterator[str]:
+    """Consume a blocking token iterator (stream_chat, a streaming query's
+    response_gen) on a worker thread, yielding each token to the event loop
+    as soon as it arrives. The worker stops when the consumer does."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    end = object()
+
+    def pump():
+        try:
+            for token in tokens:
+                if stopped.is_set():
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, token)
+            loop.call_soon_threadsafe(queue.put_nowait, end)
+        except Exception as e:
+            if not stopped.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+    worker = loop.run_in_executor(None, pump)
+    try:
+        while (token := await queue.get()) is not end:
+            if isinstance(token, Exception):
+                raise token
+            yield token
+        await worker
+    finally:
+        stopped.set()
@@ -14,6 +14,8 @@ async def main():
     # Initialize workflows with proper async support
     voice_assistant = VoiceAssistantWorkflow(index_manager)
     text_assistant = TextAssistantWorkflow(index_manager)
+    # With ANSWER_CACHE_WARM_FILE set, common questions are answered in the background
+    text_assistant.start_cache_warmup()
     
     console.print("[bold blue]Assistant Interface[/bold blue]")
     
@@ -0,0 +1,39 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Set, Tuple
+
+
+class PlaybackEvents:
+    """Fans playback state changes out to asyncio subscribers.
+
+    `publish` may be called from any thread (the mixer's event thread, the
+    keyboard listener, a workflow); each subscriber receives the event name
+    on its own loop through `call_soon_threadsafe`, so waiting for playback
+    costs no wake-ups until something actually happens.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+
+    def publish(self, kind: str) -> None:
+        with self._lock:
+            subscribers = tuple(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, kind)
+            except RuntimeError:
+                pass  # Subscriber's loop already closed
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Queue]:
+        """Queue of events published while the context is open; call from a running loop."""
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                self._subscribers.discard(entry)
@@ -1,29 +1,65 @@
 from pydub import AudioSegment
-import sounddevice as sd
 import numpy as np
 import io
 import logging
 from threading import RLock
 import soundfile as sf
 import threading
-import time
+from typing import Callable, Optional
+from utils.ring_buffer import RingBuffer
+from audio_processing.decoders import StreamResampler
+from .mixer import Mixer, MixerSource
+from .pcm_cache import PCMBuffer, PCMCache
 
 logger = logging.getLogger(__name__)
 
-class FileAudioController:
-    """Handles file-based audio playback"""
-    
-    def __init__(self):
-        self._lock = threading.RLock()
+class FileAudioController(MixerSource):
+    """Handles file-based audio playback
+
+    The file is never loaded whole: a read-ahead thread decodes float32
+    blocks from a `SoundFile` into a small ring buffer that the mixer
+    renders from, so playback starts after the first block and memory
+    stays constant however long the file is. Blocks are resampled to the
+    mixer rate as they are read, and positions are in mixer frames. Seeks
+    are served by `SoundFile.seek` on the read-ahead thread. A file read
+    start to finish without seeking is also collected into a `PCMBuffer`
+    and handed to `cache`, so a replay needs no decoding.
+
+    `render` runs on the audio thread and never takes a lock. Every piece of state it reads
+    has a single writer and is replaced by plain assignment: the pause flag
+    and seek request by the control methods, the seek fence and end-of-file
+    marker by the reader, the play position by the callback itself.
+    """
+
+    BLOCK_FRAMES = 4096
+    READ_AHEAD_SECONDS = 2.0
+    POLL_SECONDS = 0.01
+
+    def __init__(self, mixer: Mixer, cache: Optional[PCMCache] = None):
+        self.mixer = mixer
+        self.cache = cache
+        self._path: Optional[str] = None
+        self._lock = threading.RLock()  # Serializes control calls, never taken by render
         self._is_playing = False
         self._is_paused = False
         self._file_pos = 0
         self.total_frames = 0
         self.current_frame = 0
         self.samplerate = None
-        self.current_stream = None
-        self._current_samples = None
-        
+        self._file: Optional[sf.SoundFile] = None
+        self._resampler: Optional[StreamResampler] = None
+        self._ring: Optional[RingBuffer] = None
+        self._reader: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._seek_request = (0, 0)   # (epoch, frame), written by seek()
+        self._fence = (0, 0, 0)       # (epoch, ring write position, frame), written by the reader
+        self._eof_epoch = -1          # Reader reached the end of the file in this epoch
+        self._played_epoch = 0        # Fence render has applied
+        self.underruns = 0            # Renders the read-ahead could not fill
+        self._done = threading.Event()  # Set once playback finishes or is stopped
+        self._done.set()
+        self.on_finished: Optional[Callable[[], None]] = None
+
     @property
     def is_playing(self):
         return self._is_playing
@@ -35,28 +71,78 @@ class FileAudioController:
     def seek(self, seconds: float):
         """Seek to specific position"""
         with self._lock:
-            if not self.samplerate:
+            if not self.samplerate or self._ring is None:
                 return
-            new_pos = int(seconds * self.samplerate)
-            self._file_pos = max(0, min(new_pos, self.total_frames))
-            self.current_frame = self._file_pos
+            new_pos = max(0, min(int(seconds * self.samplerate), self.total_frames))
+            self.current_frame = new_pos
+            self._seek_request = (self._seek_request[0] + 1, new_pos)
+            self._wakeup.set()
 
     def play_audio_file(self, file_path: str):
         """Play audio file"""
         with self._lock:
             self.stop()
-            self._current_samples, self.samplerate = sf.read(file_path)
-            self.total_frames = len(self._current_samples)
+            self._file = sf.SoundFile(file_path)
+            self._path = file_path
+            self.samplerate = self.mixer.samplerate
+            self._resampler = StreamResampler(self._file.samplerate, self.samplerate)
+            self.total_frames = int(self._file.frames * self.samplerate / self._file.samplerate)
+            self._ring = RingBuffer(int(self.samplerate * self.READ_AHEAD_SECONDS), 1, np.float32)
             self._file_pos = 0
+            self.current_frame = 0
+            self._seek_request = (0, 0)
+            self._fence = (0, 0, 0)
+            self._eof_epoch = -1
+            self._played_epoch = 0
+            self.underruns = 0
+            self._is_paused = False
             self._is_playing = True
-            
-            self.current_stream = sd.OutputStream(
-                samplerate=self.samplerate,
-                channels=1,
-                callback=self._file_callback,
-                finished_callback=self._on_playback_finished
-            )
-            self.current_stream.start()
+            self._done.clear()
+            self._reader = threading.Thread(target=self._read_ahead, name="file-read-ahead", daemon=True)
+            self._reader.start()
+            self.mixer.add_source(self)
+
+    def _read_ahead(self):
+        """Reader thread: keep the ring topped up with decoded blocks."""
+        file, ring, resampler, path = self._file, self._ring, self._resampler, self._path
+        # Output frames one block can turn into after resampling
+        block_out = int(np.ceil(self.BLOCK_FRAMES * resampler.up / resampler.down)) + 1
+        captured = None
+        if self.cache is not None and self.total_frames * 4 <= self.cache.max_bytes:
+            captured = PCMBuffer(self.samplerate, self.total_frames + block_out)
+        while self._is_playing:
+            try:
+                request = self._seek_request
+                if request[0] != self._fence[0]:
+                    file.seek(int(request[1] * file.samplerate / self.samplerate))
+                    resampler.reset()
+                    captured = None  # No longer one continuous decode
+                    # Everything written before this point belongs to the old position
+                    self._fence = (request[0], ring.write_pos, request[1])
+                    continue  # Wait for render to drop the old blocks
+                if self._eof_epoch == self._fence[0] or ring.free() < block_out:
+                    self._wakeup.wait(self.POLL_SECONDS)
+                    self._wakeup.clear()
+                    continue
+                block = file.read(self.BLOCK_FRAMES, dtype='float32', always_2d=True)
+            except (RuntimeError, ValueError) as e:
+                # Closed by stop() or a decode error; nothing more to play
+                logger.debug(f"Read-ahead stopped: {e}")
+                self._eof_epoch = self._fence[0]
+                return
+            read = len(block)
+            block = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+            block = resampler.process(block)
+            if len(block):
+                ring.write(block, overwrite=False)
+                if captured is not None:
+                    captured.append(block)
+            if read < self.BLOCK_FRAMES:
+                self._eof_epoch = self._fence[0]
+                if captured is not None:
+                    captured.finish()
+                    self.cache.put(path, captured)
+                    captured = None
 
     def play_audio(self, file_path: str):
         self.active_mode = 'file'
@@ -66,63 +152,68 @@ class FileAudioController:
     def toggle_pause(self):
         """Toggle pause state"""
         with self._lock:
+            if self._ring is None:
+                return None
+            # The source stays in the mixer and renders silence
             self._is_paused = not self._is_paused
-            if self.current_stream:
-                if self._is_paused:
-                    self.current_stream.stop()
-                else:
-                    self.current_stream.start()
-                return self._is_paused
-
-    def _file_callback(self, outdata, frames, time, status):
-        """Callback for file playback"""
-        if status:
-            logger.warning(f"Audio stream status: {status}")
-        
-        with self._lock:
-            if self._is_paused:
-                outdata.fill(0)
-                return
-                
-            if self._current_samples is None:
-                outdata.fill(0)
-                raise sd.CallbackStop()
-                
-            remaining = len(self._current_samples) - self._file_pos
-            if remaining == 0:
-                self._is_playing = False
-                raise sd.CallbackStop()
-            
-            available_frames = min(frames, remaining)
-            outdata[:available_frames] = self._current_samples[
-                self._file_pos:self._file_pos + available_frames
-            ].reshape(-1, 1)
-            self._file_pos += available_frames
-            self.current_frame = self._file_pos
-            
-            if available_frames < frames:
-                outdata[available_frames:] = 0
-                self._is_playing = False
-                raise sd.CallbackStop()
-            
-    def _on_playback_finished(self):
-        """Callback when playback finishes"""
-        with self._lock:
-            self._is_playing = False
-            self.current_frame = self.total_frames
+            return self._is_paused
+
+    def render(self, out: np.ndarray) -> int:
+        """Mixer audio thread; lock-free, see the class docstring."""
+        ring = self._ring
+        if ring is None:
+            self.finished = True
+            return 0
+
+        fence = self._fence
+        if self._is_paused or self._seek_request[0] != fence[0]:
+            # Paused, or a seek the reader has not served yet
+            return 0
+        if fence[0] != self._played_epoch:
+            ring.skip_to(fence[1])
+            self._file_pos = fence[2]
+            self._played_epoch = fence[0]
+
+        # Read before copying, so blocks written after this check are not lost
+        eof = self._eof_epoch == fence[0]
+        available_frames = ring.read_into(out)
+        self._file_pos += available_frames
+        self.current_frame = self._file_pos
+
+        if available_frames < len(out):
+            if eof:
+                self.finished = True
+            else:
+                # Read-ahead fell behind; play silence until it catches up
+                self.underruns += 1
+        return available_frames
+
+    def mix_finished(self):
+        """Last frame handed to the mixer."""
+        self._is_playing = False
+        self.current_frame = self.total_frames
+        self._done.set()
+        if self.on_finished:
+            self.on_finished()
 
     def stop(self):
         """Stop current playback"""
         with self._lock:
-            if self.current_stream:
-                self.current_stream.stop()
-                self.current_stream.close()
-                self.current_stream = None
+            if self._ring is not None:
+                self.mixer.remove_source(self)
+                logger.info(f"File playback stopped (underruns: {self.underruns}, xruns: {self.mixer.xruns})")
             self._is_playing = False
-            self._current_samples = None
+            self._wakeup.set()
+            if self._reader and self._reader is not threading.current_thread():
+                self._reader.join(timeout=1)
+            self._reader = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._ring = None
             self._file_pos = 0
+            self._done.set()
 
     def wait_for_completion(self):
         """Block until playback completes"""
-        while self._is_playing:
-            time.sleep(0.05)
\ No newline at end of file
+        self._done.wait()
\ No newline at end of file
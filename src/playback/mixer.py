@@ -0,0 +1,207 @@
+import atexit
+import threading
+import time
+import logging
+from collections import deque
+from typing import Optional, Tuple
+import numpy as np
+import sounddevice as sd
+
+logger = logging.getLogger(__name__)
+
+
+class MixerSource:
+    """Something the mixer pulls mono float32 frames from.
+
+    `render` runs on the audio thread: it must fill `out[:n]` without
+    blocking and return `n`. A source that has produced its last frame sets
+    `finished`; the mixer then drops it and calls `mix_finished` on its own
+    thread, where blocking is allowed.
+    """
+
+    gain = 1.0
+    finished = False
+
+    def render(self, out: np.ndarray) -> int:
+        raise NotImplementedError
+
+    def mix_finished(self) -> None:
+        pass
+
+
+class BufferSource(MixerSource):
+    """Plays an in-memory buffer once, e.g. a UI earcon."""
+
+    def __init__(self, samples: np.ndarray, gain: float = 1.0):
+        self.samples = np.asarray(samples, dtype=np.float32).reshape(-1, 1)
+        self.gain = gain
+        self.pos = 0
+
+    def render(self, out: np.ndarray) -> int:
+        n = min(len(out), len(self.samples) - self.pos)
+        out[:n] = self.samples[self.pos:self.pos + n]
+        self.pos += n
+        if self.pos >= len(self.samples):
+            self.finished = True
+        return n
+
+
+def earcon(samplerate: int, frequency: float = 880.0, duration: float = 0.08) -> np.ndarray:
+    """Short sine blip with a raised-cosine envelope."""
+    t = np.arange(int(samplerate * duration)) / samplerate
+    envelope = 0.5 - 0.5 * np.cos(2 * np.pi * t / duration)
+    return (np.sin(2 * np.pi * frequency * t) * envelope).astype(np.float32)
+
+
+class Mixer:
+    """One long-lived output stream shared by every playback source.
+
+    The device is opened once, on first use, and the callback sums the
+    active sources into it with per-source gain, so starting playback is
+    only a matter of adding a source. The source list is an immutable
+    tuple replaced on every change, so the callback reads it without a
+    lock; finished sources are handed back through a deque that the event
+    thread polls every `poll_seconds`, so the callback never signals
+    (and never takes) a lock. The stream is stopped (not closed) after
+    `idle_seconds` without sources and restarted by the next `add_source`.
+    """
+
+    def __init__(
+        self,
+        samplerate: int,
+        blocksize: int = 1024,
+        idle_seconds: float = 5.0,
+        poll_seconds: float = 0.02
+    ):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.idle_seconds = idle_seconds
+        self.poll_seconds = poll_seconds
+        self.xruns = 0  # Output underflows reported by PortAudio
+        self._sources: Tuple[MixerSource, ...] = ()
+        self._scratch = np.zeros((blocksize, 1), dtype=np.float32)
+        self._monitor = np.zeros(blocksize, dtype=np.float32)  # Copy of the last output block, for meters
+        self._finished = deque()  # Appended by the callback, polled by the event thread
+        self._wakeup = threading.Event()  # Set by control calls (never the callback) to wake an idle event thread
+        self._lock = threading.RLock()
+        self._stream: Optional[sd.OutputStream] = None
+        self._events: Optional[threading.Thread] = None
+        self._closed = False
+        atexit.register(self.close)
+
+    @property
+    def sources(self) -> Tuple[MixerSource, ...]:
+        return self._sources
+
+    def add_source(self, source: MixerSource) -> None:
+        with self._lock:
+            source.finished = False
+            if source not in self._sources:
+                self._sources = self._sources + (source,)
+            self._ensure_running()
+
+    def remove_source(self, source: MixerSource) -> None:
+        with self._lock:
+            self._sources = tuple(s for s in self._sources if s is not source)
+            self._wakeup.set()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._sources = ()
+            if self._stream is not None:
+                try:
+                    self._stream.stop()
+                    self._stream.close()
+                except Exception as e:
+                    logger.warning(f"Error closing output stream: {e}")
+                self._stream = None
+            self._wakeup.set()
+
+    def level(self) -> float:
+        """RMS of the most recent output block (0 when idle)."""
+        if not self._is_active():
+            return 0.0
+        block = self._monitor
+        return float(np.sqrt(np.dot(block, block) / len(block)))
+
+    def _ensure_running(self):
+        if self._stream is None:
+            self._stream = sd.OutputStream(
+                samplerate=self.samplerate,
+                channels=1,
+                dtype='float32',
+                blocksize=self.blocksize,
+                latency='low',
+                callback=self._callback
+            )
+            logger.info(f"Output stream opened at {self.samplerate}Hz")
+        if not self._stream.active:
+            self._stream.start()
+        if self._events is None:
+            self._events = threading.Thread(target=self._event_loop, name="mixer-events", daemon=True)
+            self._events.start()
+        self._wakeup.set()
+
+    def _callback(self, outdata, frames, time, status):
+        """Audio thread: sum every active source into the output."""
+        if status.output_underflow:
+            self.xruns += 1
+        outdata.fill(0)
+        if frames > len(self._scratch):
+            self._scratch = np.zeros((frames, 1), dtype=np.float32)
+        scratch = self._scratch[:frames]
+        for source in self._sources:
+            if source.finished:
+                continue
+            n = source.render(scratch)
+            if n:
+                block = scratch[:n]
+                if source.gain != 1.0:
+                    np.multiply(block, source.gain, out=block)
+                np.add(outdata[:n], block, out=outdata[:n])
+            if source.finished:
+                self._finished.append(source)
+        np.clip(outdata, -1.0, 1.0, out=outdata)
+        n = min(frames, len(self._monitor))
+        self._monitor[:n] = outdata[:n, 0]
+
+    def _event_loop(self):
+        """Retire finished sources and stop the stream once idle."""
+        idle_since = None
+        while not self._closed:
+            # Poll while the stream runs; with it stopped, sleep until add_source or close
+            self._wakeup.wait(self.poll_seconds if self._is_active() else None)
+            self._wakeup.clear()
+            self._retire_finished()
+            with self._lock:
+                if self._sources or not self._is_active():
+                    idle_since = None
+                    continue
+                now = time.monotonic()
+                if idle_since is None:
+                    idle_since = now
+                elif now - idle_since >= self.idle_seconds:
+                    self._stream.stop()
+                    idle_since = None
+                    logger.debug("Output stream idle, stopped")
+
+    def _retire_finished(self):
+        """Drop the sources the callback reported finished and run their handlers."""
+        while self._finished:
+            source = self._finished.popleft()
+            with self._lock:
+                # Removed, or re-added for a new playback, since it finished: leave it alone
+                current = source.finished and source in self._sources
+                if current:
+                    self.remove_source(source)
+            if not current:
+                continue
+            try:
+                source.mix_finished()
+            except Exception as e:
+                logger.error(f"Playback finished handler failed: {e}")
+
+    def _is_active(self) -> bool:
+        stream = self._stream
+        return stream is not None and stream.active
@@ -0,0 +1,128 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
+import numpy as np
+from config.config import PCM_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+
+class PCMBuffer:
+    """Mono float32 PCM that one thread appends to while others read it.
+
+    Storage is allocated once, at `capacity` frames, so appending never
+    reallocates or copies on the writer's thread. Past capacity it wraps
+    around and overwrites the oldest frames: only the latest `capacity`
+    frames (from `first_frame`) stay readable, and the writer must keep
+    that far ahead of its readers. A buffer that wrapped is `truncated`
+    and cannot be replayed from the start.
+
+    The single writer copies a block in before advancing `frames`, so
+    readers (the audio thread) never take a lock: they read `frames`
+    first, then the array.
+    """
+
+    def __init__(self, samplerate: int, capacity: int = 0):
+        self.samplerate = samplerate
+        # np.zeros maps lazily, so unused capacity costs address space, not memory
+        self._data = np.zeros(max(capacity, samplerate), dtype=np.float32)
+        self.frames = 0
+        self.complete = False  # Whole source decoded; nothing more will be appended
+
+    @property
+    def first_frame(self) -> int:
+        """Oldest frame still held."""
+        return max(0, self.frames - len(self._data))
+
+    @property
+    def truncated(self) -> bool:
+        return self.first_frame > 0
+
+    @property
+    def nbytes(self) -> int:
+        return min(self.frames, len(self._data)) * self._data.itemsize
+
+    def append(self, block: np.ndarray) -> None:
+        data = self._data
+        size = len(data)
+        start = self.frames
+        if len(block) > size:
+            start += len(block) - size
+            block = block[-size:]
+        i = start % size
+        first = min(len(block), size - i)
+        data[i:i + first] = block[:first]
+        data[:len(block) - first] = block[first:]
+        self.frames = start + len(block)
+
+    def finish(self) -> None:
+        """Mark the buffer complete and release the unused tail."""
+        if not self.truncated:
+            self._data = self._data[:self.frames].copy()
+        self.complete = True
+
+    def read_into(self, start: int, out: np.ndarray) -> int:
+        """Copy frames from `start` into `out` (shaped (n, 1)) without allocating; returns frames copied."""
+        frames = self.frames
+        data = self._data
+        n = max(0, min(len(out), frames - start))
+        if n == 0:
+            return 0
+        i = start % len(data)
+        first = min(n, len(data) - i)
+        out[:first, 0] = data[i:i + first]
+        out[first:n, 0] = data[:n - first]
+        return n
+
+
+class PCMCache:
+    """Bounded LRU of decoded PCM, keyed by the file it was decoded from.
+
+    Holds complete `PCMBuffer`s at the playback rate so a replay starts
+    without touching the decoder. A file that changed on disk since it was
+    cached is a miss.
+    """
+
+    def __init__(self, max_bytes: int = PCM_CACHE_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, float], PCMBuffer]" = OrderedDict()  # Oldest first
+        self._total = 0
+
+    @staticmethod
+    def _key(path: str) -> Optional[Tuple[str, float]]:
+        try:
+            return os.path.abspath(path), os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def get(self, path: str) -> Optional[PCMBuffer]:
+        key = self._key(path)
+        with self._lock:
+            pcm = self._entries.get(key)
+            if pcm is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return pcm
+
+    def put(self, path: str, pcm: PCMBuffer) -> None:
+        """Cache a complete buffer, evicting least recently used ones to stay under the cap."""
+        key = self._key(path)
+        if key is None or not pcm.complete or pcm.truncated or pcm.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= old.nbytes
+            self._entries[key] = pcm
+            self._total += pcm.nbytes
+            while self._total > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total -= evicted.nbytes
+        logger.debug(f"Cached {pcm.frames / pcm.samplerate:.1f}s of PCM for {path}")
@@ -1,21 +1,20 @@
-import sounddevice as sd
+import asyncio
 import soundfile as sf
 import threading
-import time
 import platform
 from pynput import keyboard
 from rich.console import Console
 from rich.progress import Progress
-from typing import Optional
-import numpy as np
-import queue
+from typing import AsyncIterator, Callable, Optional, Union
 from pydub import AudioSegment
 import io
 import logging
-import ffmpeg
-import subprocess
 from .streaming import AudioStreamer
 from .file_playback import FileAudioController
+from .mixer import Mixer, BufferSource, earcon
+from .events import PlaybackEvents
+from .pcm_cache import PCMCache
+from config.config import PLAYBACK_SAMPLERATE
 
 logger = logging.getLogger(__name__)
 
@@ -35,16 +34,16 @@ class AudioController:
         self.should_stop = False
         self.listener = None
         self._lock = threading.RLock()
-        self.streaming_buffer = queue.Queue()
-        self.streaming_active = False
-        self.current_stream = None
-        self._ffmpeg_process = None
-        self._ffmpeg_stdin = None
-        self._ffmpeg_stdout = None
-        self.streamer = AudioStreamer()
-        self.file_player = FileAudioController()
+        self.mixer = Mixer(PLAYBACK_SAMPLERATE)  # One output stream shared by every source
+        self.pcm_cache = PCMCache()  # Decoded audio of recent files, for instant replay
+        self.streamer = AudioStreamer(self.mixer)
+        self.streamer.on_finished = self._on_stream_finished
+        self.file_player = FileAudioController(self.mixer, self.pcm_cache)
+        self.file_player.on_finished = self._on_file_finished
         self.active_mode = None  # 'stream' or 'file'
+        self.events = PlaybackEvents()
         self._playback_complete = threading.Event()
+        self._playback_complete.set()
         self._playback_thread = None
 
     def cleanup(self):
@@ -81,17 +80,26 @@ class AudioController:
         with self._lock:
             self.stop_all()
             self._playback_complete.clear()
-            self.active_mode = 'file'
             self._start_listener()
             self.is_playing = True
             self.should_stop = False
-            
-            # Play audio directly in the file player
-            self.file_player.play_audio_file(file_path)
-            self.samplerate = self.file_player.samplerate
-            self.total_frames = self.file_player.total_frames
             self.current_frame = 0
 
+            pcm = self.pcm_cache.get(file_path)
+            if pcm is not None:
+                # Decoded before: replay from memory, seekable like a stream
+                self.active_mode = 'stream'
+                self.streamer.play_pcm(pcm)
+                self.samplerate = pcm.samplerate
+                self.total_frames = pcm.frames
+            else:
+                # Play audio directly in the file player
+                self.active_mode = 'file'
+                self.file_player.play_audio_file(file_path)
+                self.samplerate = self.file_player.samplerate
+                self.total_frames = self.file_player.total_frames
+            self.events.publish('started')
+
     def _run_file_playback(self, file_path):
         """Blocking file playback runner"""
         try:
@@ -109,6 +117,7 @@ class AudioController:
         if self.active_mode == 'file':
             self.file_player.stop()
             self.active_mode = None
+            self._end_playback('stopped')
 
     def stop_all(self):
         """Stop all playback immediately"""
@@ -125,41 +134,121 @@ class AudioController:
             
             if self._playback_thread and self._playback_thread.is_alive():
                 self._playback_thread.join(timeout=0.5)
+            self._end_playback('stopped')
 
-    def start_streaming_playback(self, samplerate: int):
-        self.active_mode = 'stream'
-        self.streamer.start_stream(samplerate)
+    def start_streaming_playback(self):
+        """Start streamed playback; feed MP3 with add_audio_chunk, then finish_streaming."""
+        with self._lock:
+            self.stop_all()
+            self.active_mode = 'stream'
+            self._start_listener()
+            self._playback_complete.clear()
+            self.is_playing = True
+            self.is_paused = False
+            self.should_stop = False
+            self.samplerate = self.mixer.samplerate
+            self.current_frame = 0
+            self.total_frames = 0
+            self.streamer.start_stream()
+            if not self.streamer.streaming_active:
+                # Decoder failed to start; nothing will ever play
+                self._end_playback('stopped')
+                return
+            self.events.publish('started')
 
     def add_audio_chunk(self, chunk: bytes):
         if self.active_mode == 'stream':
             self.streamer.add_audio_data(chunk)
 
+    def finish_streaming(self):
+        """No more chunks; playback ends once the buffered audio has played."""
+        if self.active_mode == 'stream':
+            self.streamer.finish()
+
+    def cache_stream(self, file_path: str):
+        """Keep the decoded audio of the last stream as the PCM of `file_path`, its saved copy"""
+        pcm = self.streamer.pcm
+        if pcm is not None:
+            self.pcm_cache.put(file_path, pcm)
+
     def stop_streaming(self):
         if self.active_mode == 'stream':
             self.streamer.stop_stream()
             self.active_mode = None
+            self._end_playback('stopped')
+
+    def play_earcon(self, frequency: float = 880.0, gain: float = 0.3):
+        """Mix a short UI tone over whatever is playing"""
+        self.mixer.add_source(BufferSource(earcon(self.mixer.samplerate, frequency), gain))
+
+    def _on_stream_finished(self):
+        if self.active_mode == 'stream':
+            self._end_playback('finished')
+
+    def _on_file_finished(self):
+        if self.active_mode == 'file':
+            self._end_playback('finished')
+
+    def _end_playback(self, kind: str):
+        """Mark playback over and wake everything waiting on it"""
+        self.is_playing = False
+        self.is_paused = False
+        self._playback_complete.set()
+        self.events.publish(kind)
+
+    async def playback_events(self, tick: Union[float, Callable[[], float]] = 0.05) -> AsyncIterator[str]:
+        """Yield playback state changes until playback finishes or is stopped.
+
+        Events are 'paused', 'resumed', 'seeked', 'finished' and 'stopped', plus
+        'tick' every `tick` seconds while audio is audibly playing (for progress
+        displays). `tick` may be a callable, read before each wait, for
+        displays that adapt their refresh rate. Nothing wakes the loop while paused.
+        """
+        with self.events.subscribe() as queue:
+            while self.is_playing:
+                interval = tick() if callable(tick) else tick
+                try:
+                    kind = await asyncio.wait_for(queue.get(), None if self.is_paused else interval)
+                except asyncio.TimeoutError:
+                    kind = 'tick'
+                yield kind
+                if kind in ('finished', 'stopped'):
+                    return
 
     def _skip_frames(self, frames):
         """Skip forward or backward in the audio"""
-        if not self.samplerate or self.active_mode != 'file':
+        player = self._active_player()
+        if not self.samplerate or player is None:
             return
-            
+
         with self._lock:
-            new_position = self.file_player.current_frame + frames
-            if 0 <= new_position < self.file_player.total_frames:
-                self.file_player.seek(new_position / self.samplerate)
+            new_position = player.current_frame + frames
+            # Streams can only seek within what has been decoded so far
+            total = self.file_player.total_frames if player is self.file_player else self.streamer.decoded_frames
+            if 0 <= new_position < total:
+                player.seek(new_position / self.samplerate)
                 self.current_frame = new_position
                 direction = "→" if frames > 0 else "←"
                 self.console.print(f"[dim]{direction} {abs(frames/self.samplerate):.1f}s[/dim]")
+                self.events.publish('seeked')
 
     def _toggle_pause(self):
         """Toggle pause/resume"""
         with self._lock:
-            if self.active_mode == 'file':
-                is_paused = self.file_player.toggle_pause()
+            player = self._active_player()
+            if player is not None:
+                is_paused = player.toggle_pause()
                 self.is_paused = is_paused
                 status = "⏸ Paused" if is_paused else "▶ Resumed"
                 self.console.print(f"[dim]{status}[/dim]")
+                self.events.publish('paused' if is_paused else 'resumed')
+
+    def _active_player(self):
+        if self.active_mode == 'file':
+            return self.file_player
+        if self.active_mode == 'stream':
+            return self.streamer
+        return None
 
     def _stop(self):
         """Stop playback"""
@@ -200,33 +289,9 @@ class AudioController:
         except Exception:
             pass
 
-    def _stream_callback(self, outdata, frames, time, status):
-        """Audio output callback with error handling"""
-        try:
-            if status:
-                logger.warning(f"Audio stream status: {status}")
-            
-            pcm_data = self._ffmpeg_process.stdout.read(frames * 4)
-            if pcm_data:
-                audio_array = np.frombuffer(pcm_data, dtype=np.float32)
-                outdata[:] = audio_array.reshape(-1, 1)
-            else:
-                outdata.fill(0)
-                if not self.streaming_active:
-                    raise sd.CallbackStop()
-            
-        except Exception as e:
-            logger.error(f"Audio callback error: {str(e)}")
-            raise sd.CallbackAbort from e
-
     def wait_for_playback(self):
-        """Non-blocking wait for playback completion"""
-        while self.is_playing and not self.should_stop:
-            if self.active_mode == 'file':
-                if not self.file_player.is_playing:
-                    self.is_playing = False
-                    break
-            time.sleep(0.05)  # Reduced sleep time
+        """Block until playback finishes or is stopped"""
+        self._playback_complete.wait()
 
     def _start_listener(self):
         """Start keyboard listener if not already running"""
@@ -234,10 +299,20 @@ class AudioController:
             self.listener = keyboard.Listener(on_press=self.on_press)
             self.listener.start()
 
+    def output_level(self) -> float:
+        """RMS level of what is currently being played"""
+        return self.mixer.level() if self.is_playing and not self.is_paused else 0.0
+
     def update_progress(self):
-        """Update current frame from file player"""
+        """Update current frame from the active player"""
         if self.active_mode == 'file':
             self.current_frame = self.file_player.current_frame
+            if not self.file_player.is_playing:
+                self.is_playing = False
+        elif self.active_mode == 'stream':
+            self.current_frame = self.streamer.current_frame
+            # Total grows as more of the response is synthesized
+            self.total_frames = max(self.streamer.estimated_total_frames, self.current_frame)
 
 # Maintain backward compatibility
 audio_controller = AudioController()
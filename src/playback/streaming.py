@@ -1,107 +1,270 @@
-import sounddevice as sd
 import numpy as np
-import ffmpeg
-import subprocess
+import threading
+import time
 import logging
 from threading import RLock
-from typing import Optional
+from typing import Callable, Optional
+from .pcm_cache import PCMBuffer
+from audio_processing.decoders import StreamDecoder, create_stream_decoder
+from .mixer import Mixer, MixerSource
+from config.config import STREAM_JITTER_MS, STREAM_BUFFER_SECONDS, STREAM_MAX_SECONDS
 
 logger = logging.getLogger(__name__)
 
-class AudioStreamer:
-    """Handles real-time audio streaming using FFmpeg"""
-    
-    def __init__(self):
+class AudioStreamer(MixerSource):
+    """Handles real-time playback of streamed MP3
+
+    MP3 is decoded in-process when libsndfile supports it, otherwise by an
+    FFmpeg subprocess, at the mixer's sample rate. A decoder thread appends
+    the PCM to a `PCMBuffer`, and `render` (called from the mixer's audio
+    callback) only copies out of that buffer, so a stalled decoder can
+    starve playback but never block the audio thread. The buffer is
+    allocated once for `max_seconds`, and that much of the stream is
+    kept, so it can be paused, seeked within what has been decoded, and
+    handed to the PCM cache for replay; `play_pcm` plays such a cached
+    buffer without a decoder. A longer stream wraps around, keeping its
+    latest `max_seconds` to seek in, and is not cached.
+
+    Playback (re)starts once `jitter_ms` of audio is buffered, and the
+    decoder stays at most `buffer_seconds` ahead of playback. `underruns`
+    counts renders that found the buffer empty mid-stream, `overruns`
+    counts times the decoder had to wait for playback to catch up.
+    """
+
+    DECODE_BLOCK_FRAMES = 1024
+
+    def __init__(
+        self,
+        mixer: Mixer,
+        jitter_ms: int = STREAM_JITTER_MS,
+        buffer_seconds: float = STREAM_BUFFER_SECONDS,
+        max_seconds: float = STREAM_MAX_SECONDS
+    ):
         self._lock = RLock()
+        self.mixer = mixer
+        self.jitter_ms = jitter_ms
+        self.buffer_seconds = buffer_seconds
+        # Room for the read-ahead plus the audio being played, so the decoder never overwrites either
+        self.max_seconds = max(max_seconds, 2 * buffer_seconds)
         self.samplerate: Optional[int] = None
-        self._ffmpeg_process: Optional[subprocess.Popen] = None
-        self._output_stream: Optional[sd.OutputStream] = None
+        self._decoder: Optional[StreamDecoder] = None
+        self._decoder_thread: Optional[threading.Thread] = None
+        self._pcm: Optional[PCMBuffer] = None
+        self._jitter_frames = 0
+        self._ahead_frames = 0
+        self._is_paused = False
+        self._seek_request = (0, 0)  # (epoch, frame), written by seek()
+        self._seek_epoch = 0         # Request render has applied
+        self._buffering = True      # Render outputs silence until the jitter depth is reached
+        self._decoder_done = False  # Decoder output fully appended to the buffer
         self.streaming_active = False
+        self.input_finished = False  # No more MP3 data will arrive
+        self.frames_played = 0
+        self.bytes_fed = 0
+        self.underruns = 0
+        self.overruns = 0
+        self.mp3_bitrate = 48000  # EdgeTTS outputs 48 kbit/s CBR, used for duration estimates
+        self.on_finished: Optional[Callable[[], None]] = None
 
-    def start_stream(self, samplerate: int) -> None:
-        """Initialize audio streaming with specified sample rate"""
+    def start_stream(self) -> None:
+        """Start a stream; feed it with add_audio_data, then finish"""
         with self._lock:
             self._cleanup()
             try:
-                if not 8000 <= samplerate <= 48000:
-                    raise ValueError(f"Invalid sample rate: {samplerate}")
-                
-                self._ffmpeg_process = (
-                    ffmpeg
-                    .input('pipe:', format='mp3', loglevel='error')
-                    .output('pipe:', format='f32le', acodec='pcm_f32le', 
-                           ac=1, ar=samplerate, hide_banner=None, nostats=None)
-                    .run_async(pipe_stdin=True, pipe_stdout=True, quiet=True)
+                samplerate = self.mixer.samplerate
+                self._decoder = create_stream_decoder(samplerate)
+                self._reset(PCMBuffer(samplerate, int(samplerate * self.max_seconds)))
+                self._decoder_done = False
+                self.input_finished = False
+                self._decoder_thread = threading.Thread(
+                    target=self._decode_loop,
+                    args=(self._decoder, self._pcm),
+                    name="mp3-decoder",
+                    daemon=True
                 )
-                
-                self._output_stream = sd.OutputStream(
-                    samplerate=samplerate,
-                    channels=1,
-                    dtype='float32',
-                    callback=self._audio_callback,
-                    blocksize=1024,
-                    latency='low'
-                )
-                self._output_stream.start()
-                self.samplerate = samplerate
-                self.streaming_active = True
+                self._decoder_thread.start()
+                self.mixer.add_source(self)
                 logger.info(f"Streaming started at {samplerate}Hz")
-                
+
             except Exception as e:
                 logger.error(f"Stream initialization failed: {str(e)}")
                 self._cleanup()
                 raise
 
+    def play_pcm(self, pcm: PCMBuffer) -> None:
+        """Play an already decoded buffer, e.g. from the PCM cache"""
+        with self._lock:
+            self._cleanup()
+            self._reset(pcm)
+            self._decoder_done = True
+            self.input_finished = True
+            self.mixer.add_source(self)
+
+    def _reset(self, pcm: PCMBuffer) -> None:
+        self._pcm = pcm
+        self.samplerate = pcm.samplerate
+        self._jitter_frames = int(pcm.samplerate * self.jitter_ms / 1000)
+        self._ahead_frames = int(pcm.samplerate * self.buffer_seconds)
+        self._buffering = True
+        self._is_paused = False
+        self._seek_request = (0, 0)
+        self._seek_epoch = 0
+        self.streaming_active = True
+        self.frames_played = 0
+        self.bytes_fed = 0
+        self.underruns = 0
+        self.overruns = 0
+
     def add_audio_data(self, chunk: bytes) -> None:
-        """Send MP3 data to FFmpeg decoder"""
+        """Send MP3 data to the decoder"""
         with self._lock:
-            if self.streaming_active and self._ffmpeg_process:
+            decoder = self._decoder if self.streaming_active else None
+        if decoder is None:
+            return
+        # Not under the lock: the FFmpeg decoder blocks while it is far ahead of playback,
+        # and stop_stream must still be able to interrupt it
+        try:
+            decoder.write(chunk)
+            self.bytes_fed += len(chunk)
+        except Exception as e:
+            if self.streaming_active:
+                logger.error(f"Error writing to decoder: {str(e)}")
+
+    @property
+    def estimated_total_frames(self) -> int:
+        """Playback length of the MP3 data fed so far (exact once decoding is done)."""
+        if not self.samplerate:
+            return 0
+        if self._decoder_done and self._pcm is not None:
+            return self._pcm.frames
+        return int(self.bytes_fed * 8 / self.mp3_bitrate * self.samplerate)
+
+    @property
+    def buffered_frames(self) -> int:
+        """Decoded audio waiting to be played."""
+        return max(0, self._pcm.frames - self.frames_played) if self._pcm else 0
+
+    @property
+    def decoded_frames(self) -> int:
+        return self._pcm.frames if self._pcm else 0
+
+    @property
+    def current_frame(self) -> int:
+        """Play position, counting a seek render has not applied yet."""
+        request = self._seek_request
+        return request[1] if request[0] != self._seek_epoch else self.frames_played
+
+    @property
+    def pcm(self) -> Optional[PCMBuffer]:
+        """The fully decoded stream, once decoding has finished."""
+        pcm = self._pcm
+        return pcm if pcm is not None and pcm.complete and not pcm.truncated else None
+
+    def seek(self, seconds: float) -> None:
+        """Seek within the audio decoded so far and still held"""
+        with self._lock:
+            if self._pcm is None:
+                return
+            frame = max(self._pcm.first_frame, min(int(seconds * self.samplerate), self._pcm.frames))
+            self._seek_request = (self._seek_request[0] + 1, frame)
+
+    def toggle_pause(self) -> Optional[bool]:
+        with self._lock:
+            if self._pcm is None:
+                return None
+            self._is_paused = not self._is_paused
+            return self._is_paused
+
+    def finish(self) -> None:
+        """Signal end of input; playback continues until the decoded audio runs out."""
+        with self._lock:
+            if self.streaming_active and self._decoder and not self.input_finished:
+                self.input_finished = True
                 try:
-                    self._ffmpeg_process.stdin.write(chunk)
-                    self._ffmpeg_process.stdin.flush()
+                    self._decoder.finish()
                 except Exception as e:
-                    logger.error(f"Error writing to FFmpeg: {str(e)}")
+                    logger.error(f"Error closing decoder input: {str(e)}")
 
     def stop_stream(self) -> None:
         """Stop streaming and clean up resources"""
         with self._lock:
             self.streaming_active = False
+            self.mixer.remove_source(self)
             try:
-                if self._ffmpeg_process:
-                    self._ffmpeg_process.stdin.close()
-                    self._ffmpeg_process.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                logger.warning("FFmpeg termination timed out")
+                if self._decoder:
+                    self._decoder.close()
             finally:
-                if self._output_stream:
-                    self._output_stream.stop()
-                    self._output_stream.close()
+                if self._decoder_thread:
+                    self._decoder_thread.join(timeout=1)
+                if self.samplerate:
+                    logger.info(
+                        f"Streaming resources released "
+                        f"(underruns: {self.underruns}, overruns: {self.overruns}, xruns: {self.mixer.xruns})"
+                    )
                 self._cleanup()
-                logger.info("Streaming resources released")
 
-    def _audio_callback(self, outdata: np.ndarray, frames: int,
-                       time, status: int) -> None:
-        """Sounddevice audio output callback"""
+    def _decode_loop(self, decoder: StreamDecoder, pcm: PCMBuffer) -> None:
+        """Decoder thread: append decoded PCM to the stream's buffer."""
+        # Half a block of playback time between checks while too far ahead
+        wait = self.DECODE_BLOCK_FRAMES / pcm.samplerate / 2
         try:
-            if status:
-                logger.warning(f"Audio stream status: {status}")
-            
-            if self._ffmpeg_process:
-                pcm_data = self._ffmpeg_process.stdout.read(frames * 4)
-                if pcm_data:
-                    audio_array = np.frombuffer(pcm_data, dtype=np.float32)
-                    outdata[:] = audio_array.reshape(-1, 1)
-                else:
-                    outdata.fill(0)
-                    if not self.streaming_active:
-                        raise sd.CallbackStop()
+            while self.streaming_active:
+                samples = decoder.read()
+                if samples is None:
+                    pcm.finish()
+                    break
+                if pcm.frames - self.frames_played > self._ahead_frames:
+                    self.overruns += 1
+                    while pcm.frames - self.frames_played > self._ahead_frames and self.streaming_active:
+                        time.sleep(wait)
+                pcm.append(samples.reshape(-1))
         except Exception as e:
-            logger.error(f"Audio callback error: {str(e)}")
-            raise sd.CallbackAbort from e
+            if self.streaming_active:
+                logger.error(f"Decoder error: {str(e)}")
+        finally:
+            self._decoder_done = True
+
+    def render(self, out: np.ndarray) -> int:
+        """Mixer audio thread; copies from the PCM buffer only, never locks."""
+        pcm = self._pcm
+        # Read before copying: frames appended after this check are picked up next time
+        decoder_done = self._decoder_done
+        if pcm is None:
+            self.finished = True
+            return 0
+        if self._is_paused:
+            return 0
+        request = self._seek_request
+        if request[0] != self._seek_epoch:
+            self.frames_played = request[1]
+            self._seek_epoch = request[0]
+
+        if self._buffering:
+            if pcm.frames - self.frames_played < self._jitter_frames and not decoder_done:
+                return 0
+            self._buffering = False
+
+        copied = pcm.read_into(self.frames_played, out)
+        self.frames_played += copied
+        if copied < len(out):
+            if decoder_done or not self.streaming_active:
+                self.finished = True
+            else:
+                # Starved mid-stream: rebuild the jitter cushion before resuming
+                self.underruns += 1
+                self._buffering = True
+        return copied
+
+    def mix_finished(self) -> None:
+        """Last frame handed to the mixer."""
+        self.streaming_active = False
+        if self.on_finished:
+            self.on_finished()
 
     def _cleanup(self) -> None:
         """Internal resource cleanup"""
-        self._ffmpeg_process = None
-        self._output_stream = None
+        self._decoder = None
+        self._decoder_thread = None
+        self._pcm = None
         self.samplerate = None
-        self.streaming_active = False
\ No newline at end of file
+        self.streaming_active = False
@@ -1,7 +1,9 @@
 import os
 from typing import Optional, Union, List
 from groq import Groq
-from config.config import GROQ_API_KEY  # Changed to absolute import
+from config.config import GROQ_API_KEY, RECORDINGS_DIR  # Changed to absolute import
+from utils.groq_client import get_http_client
+from audio_processing.recording import Recording
 import traceback
 from pydub import AudioSegment
 
@@ -21,13 +23,13 @@ class GroqWhisperAPI:
         if not GROQ_API_KEY:
             raise ValueError("GROQ_API_KEY is not set in environment variables.")
         
-        # Initialize the client directly with the API key
-        self.client = Groq(api_key=GROQ_API_KEY)
+        # Share the pooled, rate-limited HTTP client with the LLM; RequestPolicy is the only retry layer
+        self.client = Groq(api_key=GROQ_API_KEY, max_retries=0, http_client=get_http_client())
         #self.analyzer = TextAnalyzer()
 
     def transcribe_audio(
         self,
-        file_path: str,
+        file_path: Union[str, Recording],
         model_id: Optional[str] = None,
         prompt: Optional[str] = None,
         response_format: str = 'json',
@@ -37,28 +39,60 @@ class GroqWhisperAPI:
         product_names: Optional[List[str]] = None
     ) -> Union[dict, str]:
         try:
-            model_id = model_id or self.SELECTED_MODEL
-            file_size = os.path.getsize(file_path)
-            if file_size > 25 * 1024 * 1024:  # 25 MB
-                chunks = _split_audio(file_path)
-                transcriptions = []
-                for chunk in chunks:
-                    with open(chunk, "rb") as file:
-                        transcription = self.client.audio.transcriptions.create(
-                            file=(os.path.basename(chunk), file.read()),
-                            model=model_id,
-                            prompt=prompt,
-                            response_format=response_format,
-                            language=language,
-                            temperature=temperature,
-                            timestamp_granularities=timestamp_granularities
-                        )
-                    transcriptions.append(transcription.text if response_format != 'json' else transcription.to_dict()['text'])
-                full_transcription = " ".join(transcriptions)
-            else:
-                with open(file_path, "rb") as file:
+            return self.transcribe(
+                file_path,
+                model_id=model_id,
+                prompt=prompt,
+                response_format=response_format,
+                language=language,
+                temperature=temperature,
+                timestamp_granularities=timestamp_granularities
+            )
+        except Exception as e:
+            print(f"An error occurred during transcription: {e}")
+            traceback.print_exc()
+            return {"error": str(e)}
+
+    def transcribe(
+        self,
+        audio: Union[str, Recording],
+        model_id: Optional[str] = None,
+        prompt: Optional[str] = None,
+        response_format: str = 'json',
+        language: Optional[str] = None,
+        temperature: Optional[float] = None,
+        timestamp_granularities: Optional[List[str]] = None
+    ) -> str:
+        """Transcribe a file path or an in-memory Recording.
+
+        Raises API errors so a RequestPolicy can retry or hedge.
+        """
+        model_id = model_id or self.SELECTED_MODEL
+        if isinstance(audio, Recording):
+            payload = audio.to_wav_bytes()
+            if len(payload) <= 25 * 1024 * 1024:
+                transcription = self.client.audio.transcriptions.create(
+                    file=(audio.filename, payload),
+                    model=model_id,
+                    prompt=prompt,
+                    response_format=response_format,
+                    language=language,
+                    temperature=temperature,
+                    timestamp_granularities=timestamp_granularities
+                )
+                return transcription.text
+            # Too large for one request: split from disk like any long file
+            audio = audio.path or audio.save(RECORDINGS_DIR)
+
+        file_path = audio
+        file_size = os.path.getsize(file_path)
+        if file_size > 25 * 1024 * 1024:  # 25 MB
+            chunks = _split_audio(file_path)
+            transcriptions = []
+            for chunk in chunks:
+                with open(chunk, "rb") as file:
                     transcription = self.client.audio.transcriptions.create(
-                        file=(os.path.basename(file_path), file.read()),
+                        file=(os.path.basename(chunk), file.read()),
                         model=model_id,
                         prompt=prompt,
                         response_format=response_format,
@@ -66,13 +100,20 @@ class GroqWhisperAPI:
                         temperature=temperature,
                         timestamp_granularities=timestamp_granularities
                     )
-                #full_transcription = transcription.text if response_format != 'json' else transcription.to_dict()['text']
-            return transcription.text
+                transcriptions.append(transcription.text if response_format != 'json' else transcription.to_dict()['text'])
+            return " ".join(transcriptions)
 
-        except Exception as e:
-            print(f"An error occurred during transcription: {e}")
-            traceback.print_exc()
-            return {"error": str(e)}
+        with open(file_path, "rb") as file:
+            transcription = self.client.audio.transcriptions.create(
+                file=(os.path.basename(file_path), file.read()),
+                model=model_id,
+                prompt=prompt,
+                response_format=response_format,
+                language=language,
+                temperature=temperature,
+                timestamp_granularities=timestamp_granularities
+            )
+        return transcription.text
 
     def translate_audio(
         self,
@@ -0,0 +1,48 @@
+import numpy as np
+from playback.mixer import Mixer, BufferSource
+
+
+class _Status:
+    output_underflow = False
+
+
+def _render(mixer: Mixer):
+    """Run one audio callback without an output device."""
+    outdata = np.zeros((mixer.blocksize, 1), dtype=np.float32)
+    mixer._callback(outdata, mixer.blocksize, None, _Status())
+
+
+def check_readded_source_survives_stale_finish():
+    """A source re-added before its earlier finish is retired keeps playing."""
+    mixer = Mixer(24000, blocksize=256)
+    finished = []
+    source = BufferSource(np.ones(100, dtype=np.float32))
+    source.mix_finished = lambda: finished.append(source.pos)
+    mixer._sources = (source,)  # add_source would open the output device
+
+    _render(mixer)
+    assert source.finished and len(mixer._finished) == 1
+
+    # Re-added for a new playback (as add_source does) before the event thread ran
+    source.samples = np.ones(1000, dtype=np.float32).reshape(-1, 1)
+    source.pos = 0
+    source.finished = False
+    mixer._retire_finished()
+    assert source in mixer.sources, "stale finish removed the new playback"
+    assert not finished, "stale finish ran the handler"
+
+    while not source.finished:
+        _render(mixer)
+    mixer._retire_finished()
+    assert source not in mixer.sources
+    assert finished == [1000]
+    mixer.close()
+
+
+def main():
+    check_readded_source_survives_stale_finish()
+    print("Mixer checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@ import asyncio
 from playback.playback_module import audio_controller
 from tts.edge_tts_wrapper import EdgeTTSWrapper
 import logging
-import numpy as np
 import time
 from rich.live import Live
 from ui.playback_ui import PlaybackDisplay
@@ -21,7 +20,7 @@ async def main():
         logger.info(f"Sample rate: {sample_rate}")
         
         logger.info("Starting playback system...")
-        audio_controller.start_streaming_playback(sample_rate)
+        audio_controller.start_streaming_playback()
         
         # Add small delay to let audio system initialize
         await asyncio.sleep(0.5)
@@ -54,18 +53,16 @@ async def main():
         
         await stream_task
         
-        # Add final silence to flush buffer
-        silence = np.zeros(1024, dtype=np.float32)
-        audio_controller.streaming_buffer.put(silence)
-        await asyncio.sleep(0.5)
+        # No more input; playback ends once the decoded audio has played
+        audio_controller.finish_streaming()
         
         # Add UI display
         display = PlaybackDisplay(audio_controller)
         
-        with Live(display.live_display(), refresh_per_second=4):
-            while audio_controller.streaming_active:
-                display.update()
-                await asyncio.sleep(0.25)
+        with Live(display.live_display(), auto_refresh=False) as live:
+            async for event in audio_controller.playback_events(tick=display.tick):
+                display.refresh(live, force=event != 'tick')
+        logger.info(f"UI: {display.renders} redraws, {display.render_seconds * 1000:.0f}ms rendering")
         
     except Exception as e:
         logger.error(f"Error in main: {str(e)}")
@@ -1,9 +1,10 @@
 import edge_tts
 from .tts_base import BaseTTS
 from config.config import VOICE_OUTPUTS_DIR
+from .tts_cache import TTSCache, get_tts_cache
 import os
 import uuid
-from typing import Callable, Awaitable
+from typing import Callable, Awaitable, Optional
 import asyncio
 import logging
 
@@ -14,21 +15,33 @@ class EdgeTTSWrapper(BaseTTS):
 
     SELECT_VOICE_PT_PT = ["pt-PT-RaquelNeural", "pt-PT-DuarteNeural"]
     SELECT_VOICE_PT_BR = ["pt-BR-AntonioNeural", "pt-BR-IsabelaNeural"]
+    OUTPUT_FORMAT = "audio-24khz-48kbitrate-mono-mp3"  # What edge-tts produces
 
     def __init__(self, 
                 voice: str = SELECT_VOICE_PT_PT[1],
                 rate: str = "+25%",
                 volume: str = "+0%",
-                pitch: str = "+100Hz"):
+                pitch: str = "+100Hz",
+                cache: Optional[TTSCache] = None):
         self.voice = voice
         self.rate = rate
         self.volume = volume
         self.pitch = pitch
+        self.cache = cache or get_tts_cache()
         self._connection_retries = 3
         self._connection_retry_delay = 1
 
+    def _cache_key(self, text: str) -> str:
+        return TTSCache.make_key(text, self.voice, self.rate, self.volume, self.pitch, self.OUTPUT_FORMAT)
+
     async def generate_audio(self, text: str) -> str:
         """Generate and save audio file with improved connection handling"""
+        key = self._cache_key(text)
+        cached_path = self.cache.get(key)
+        if cached_path:
+            logger.info(f"TTS cache hit: {cached_path}")
+            return cached_path
+
         max_retries = 3
         retry_delay = 1
         
@@ -53,7 +66,7 @@ class EdgeTTSWrapper(BaseTTS):
                             
                         if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
                             logger.info(f"Successfully generated audio file: {output_path}")
-                            return output_path
+                            return self.cache.put_file(key, output_path)
                         else:
                             raise Exception("Generated audio file is empty or does not exist")
                             
@@ -92,12 +105,65 @@ class EdgeTTSWrapper(BaseTTS):
                 
         raise Exception("Failed to generate audio after all retries")
 
-    async def stream_audio(self, text: str, chunk_handler: Callable[[bytes], Awaitable[None]]):
-        """Stream audio chunks"""
-        communicate = edge_tts.Communicate(text, self.voice)
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                await chunk_handler(chunk["data"])
+    async def synthesize(self, text: str, timeout: float = 30) -> bytes:
+        """Synthesize `text` to MP3 bytes in memory with the configured voice settings.
+
+        Cached audio is returned without a network round trip.
+        """
+        chunks = []
+
+        async def collect(chunk: bytes):
+            chunks.append(chunk)
+
+        await self.stream_audio(text, collect, timeout=timeout)
+        return b"".join(chunks)
+
+    async def stream_audio(self, text: str, chunk_handler: Callable[[bytes], Awaitable[None]], timeout: float = 30):
+        """Stream audio chunks as they arrive, honouring voice, rate, volume and pitch.
+
+        A cached phrase is delivered as a single chunk. Connection failures are
+        retried until the first chunk has been handed out; `timeout` applies to
+        the wait for each chunk, so a slow consumer never trips it.
+        """
+        key = self._cache_key(text)
+        cached = self.cache.get_bytes(key)
+        if cached is not None:
+            await chunk_handler(cached)
+            return
+
+        last_error = None
+        for attempt in range(self._connection_retries):
+            delivered = []
+            try:
+                communicate = edge_tts.Communicate(
+                    text,
+                    self.voice,
+                    rate=self.rate,
+                    volume=self.volume,
+                    pitch=self.pitch
+                )
+                stream = communicate.stream()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(anext(stream), timeout)
+                    except StopAsyncIteration:
+                        break
+                    if chunk["type"] == "audio":
+                        delivered.append(chunk["data"])
+                        await chunk_handler(chunk["data"])
+                if delivered:
+                    self.cache.put(key, b"".join(delivered))
+                    return
+                last_error = Exception("No audio received")
+            except Exception as e:
+                if delivered:
+                    # Part of the audio is already playing; a retry would repeat it
+                    raise
+                last_error = e
+            logger.error(f"Synthesis error (attempt {attempt + 1}): {str(last_error)}")
+            if attempt < self._connection_retries - 1:
+                await asyncio.sleep(self._connection_retry_delay * 2 ** attempt)
+        raise Exception(f"Failed to synthesize speech: {str(last_error)}")
 
     @property
     def default_sample_rate(self) -> int:
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import re
+import uuid
+import logging
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from config.config import VOICE_OUTPUTS_DIR
+from utils.audio_archive import get_voice_outputs_archive
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…;:])\s+|\n+')
+
+
+def split_sentences(text: str, min_chars: int = 25, max_chars: int = 300) -> List[str]:
+    """Split text into speakable sentences.
+
+    Fragments shorter than `min_chars` are merged into their neighbour so
+    every request carries enough text to be worth a round trip; sentences
+    longer than `max_chars` are cut at the last comma or space.
+    """
+    pieces = [p.strip() for p in _SENTENCE_END.split(text) if p and p.strip()]
+    sentences = []
+    for piece in pieces:
+        while len(piece) > max_chars:
+            cut = max(piece.rfind(',', 0, max_chars), piece.rfind(' ', 0, max_chars))
+            cut = cut + 1 if cut > 0 else max_chars
+            sentences.append(piece[:cut].strip())
+            piece = piece[cut:].strip()
+        if sentences and piece and min(len(sentences[-1]), len(piece)) < min_chars:
+            sentences[-1] = f"{sentences[-1]} {piece}"
+        elif piece:
+            sentences.append(piece)
+    return sentences
+
+
+class SentenceBuffer:
+    """Cuts a growing stream of text (LLM tokens) into speakable sentences.
+
+    `feed` returns the sentences completed so far, using the same rules as
+    `split_sentences`; a boundary only counts once the whitespace after it
+    has arrived, so "3.5" is never split. `flush` returns the remainder.
+    """
+
+    def __init__(self, min_chars: int = 25, max_chars: int = 300):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._text = ""
+
+    def feed(self, token: str) -> List[str]:
+        self._text += token
+        boundary = None
+        for boundary in _SENTENCE_END.finditer(self._text):
+            pass
+        if boundary is not None and len(self._text[:boundary.start()].strip()) >= self.min_chars:
+            done, self._text = self._text[:boundary.start()], self._text[boundary.end():]
+        elif len(self._text) > self.max_chars:
+            # No usable boundary yet: cut at the last comma or space, as split_sentences does
+            cut = max(self._text.rfind(',', 0, self.max_chars), self._text.rfind(' ', 0, self.max_chars))
+            cut = cut + 1 if cut > 0 else self.max_chars
+            done, self._text = self._text[:cut], self._text[cut:]
+        else:
+            return []
+        return split_sentences(done, self.min_chars, self.max_chars)
+
+    def flush(self) -> List[str]:
+        text, self._text = self._text, ""
+        return split_sentences(text, self.min_chars, self.max_chars)
+
+
+async def stream_sentences(tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Sentences of a token stream, each yielded as soon as it is complete."""
+    buffer = SentenceBuffer()
+    async for token in tokens:
+        for sentence in buffer.feed(token):
+            yield sentence
+    for sentence in buffer.flush():
+        yield sentence
+
+
+class SentencePipeline:
+    """Synthesizes a response sentence by sentence with bounded parallelism.
+
+    Sentences are synthesized concurrently (at most `max_parallel` requests
+    in flight) but handed to `chunk_handler` strictly in order. The sentence
+    currently being played streams chunk by chunk as edge-tts produces
+    them, so time to first audio is the latency of the first chunk; later
+    sentences are buffered until their turn. Sentences may come from a
+    finished text (`run`) or arrive while the LLM is still generating
+    (`run_stream`). The full MP3 is also saved for replay.
+    """
+
+    def __init__(self, tts, max_parallel: int = 3):
+        self.tts = tts
+        self.max_parallel = max_parallel
+
+    async def run(
+        self,
+        text: str,
+        chunk_handler: Callable[[bytes], Awaitable[None]],
+        output_path: Optional[str] = None
+    ) -> Optional[str]:
+        """Speak `text` through `chunk_handler`; returns the path of the saved MP3."""
+        async def sentences():
+            for sentence in split_sentences(text):
+                yield sentence
+
+        return await self.run_stream(sentences(), chunk_handler, output_path)
+
+    async def run_stream(
+        self,
+        sentences: AsyncIterator[str],
+        chunk_handler: Callable[[bytes], Awaitable[None]],
+        output_path: Optional[str] = None
+    ) -> Optional[str]:
+        """Speak sentences as they arrive; returns the saved MP3 path, or None if there were none."""
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        order: asyncio.Queue = asyncio.Queue()  # One chunk queue per sentence, in speaking order
+        tasks = []
+
+        async def produce(sentence: str, queue: asyncio.Queue):
+            async with semaphore:
+                try:
+                    await self.tts.stream_audio(sentence, queue.put)
+                except Exception as e:
+                    await queue.put(e)
+                    return
+            await queue.put(None)  # End of this sentence
+
+        async def schedule():
+            try:
+                async for sentence in sentences:
+                    queue = asyncio.Queue()
+                    tasks.append(asyncio.create_task(produce(sentence, queue)))
+                    await order.put(queue)
+            except Exception as e:
+                await order.put(e)
+                return
+            await order.put(None)  # No more sentences
+
+        scheduler = asyncio.create_task(schedule())
+        f = None
+        try:
+            count = 0
+            while (queue := await order.get()) is not None:
+                if isinstance(queue, Exception):
+                    raise queue
+                if f is None:
+                    output_path = output_path or os.path.join(VOICE_OUTPUTS_DIR, f"tts_{uuid.uuid4()}.mp3")
+                    f = open(output_path, 'wb')
+                count += 1
+                while (chunk := await queue.get()) is not None:
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    await chunk_handler(chunk)
+                    f.write(chunk)
+                logger.debug(f"Sentence {count} played out")
+        except BaseException:
+            scheduler.cancel()
+            for task in tasks:
+                task.cancel()
+            if f is not None:
+                f.close()
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+            raise
+        if f is None:
+            return None
+        f.close()
+        get_voice_outputs_archive().add_file(output_path)
+        return output_path
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import shutil
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional
+from config.config import VOICE_OUTPUTS_DIR, TTS_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+
+class TTSCache:
+    """Content-addressed cache of synthesized audio with an LRU size cap.
+
+    Entries are keyed by a hash of everything that affects the audio (text,
+    voice, rate, volume, pitch and output format), so a repeated phrase is
+    served from disk without any network round trip. Recency is kept in the
+    files' modification times, so the LRU order survives restarts.
+    """
+
+    def __init__(self, directory: str = os.path.join(VOICE_OUTPUTS_DIR, "tts_cache"),
+                 max_bytes: int = TTS_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # name -> size, oldest first
+        self._total = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def make_key(text: str, voice: str, rate: str, volume: str, pitch: str, output_format: str) -> str:
+        payload = "\x1f".join((text, voice, rate, volume, pitch, output_format))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached audio, or None on a miss."""
+        name = f"{key}.mp3"
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(name)
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            # Deleted behind our back
+            with self._lock:
+                self._total -= self._entries.pop(name, 0)
+                self.hits -= 1
+                self.misses += 1
+            return None
+        return path
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key: str, data: bytes) -> str:
+        """Store audio bytes under `key` and return the cached path."""
+        path = self.path_for(key)
+        tmp = f"{path}.{threading.get_ident()}.part"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._add(f"{key}.mp3", len(data))
+        return path
+
+    def put_file(self, key: str, source_path: str) -> str:
+        """Move an already generated file into the cache and return the cached path."""
+        path = self.path_for(key)
+        shutil.move(source_path, path)
+        self._add(f"{key}.mp3", os.path.getsize(path))
+        return path
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._total
+            }
+
+    def _add(self, name: str, size: int):
+        evicted = []
+        with self._lock:
+            self._total -= self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._total += size
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+        if evicted:
+            logger.info(f"TTS cache evicted {len(evicted)} entries")
+
+    def _load(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.part'):
+                os.remove(path)
+            elif name.endswith('.mp3'):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total += size
+
+
+_cache: Optional[TTSCache] = None
+
+
+def get_tts_cache() -> TTSCache:
+    global _cache
+    if _cache is None:
+        _cache = TTSCache()
+    return _cache
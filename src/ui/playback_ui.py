@@ -3,11 +3,28 @@ from rich.panel import Panel
 from rich.progress import Progress, TextColumn, BarColumn, TimeRemainingColumn
 from rich.text import Text
 from rich.console import Console, Group
+import math
 import time
+from config.config import PLAYBACK_UI_CPU_BUDGET
 
 class PlaybackDisplay:
-    def __init__(self, controller):
+    """Playback panel that is built once and updated in place.
+
+    `live_display()` always returns the same renderable; `update()` only
+    touches the fields that changed. `refresh(live)` redraws at most once
+    per `update_interval`, which adapts to the CPU time a redraw takes on
+    this terminal so rendering stays under `cpu_budget` of one core.
+    Subscribe with `playback_events(tick=display.tick)` so the loop only
+    wakes at that interval.
+    """
+
+    METER_WIDTH = 24
+    MIN_INTERVAL = 0.05
+    MAX_INTERVAL = 0.5
+
+    def __init__(self, controller, cpu_budget: float = PLAYBACK_UI_CPU_BUDGET):
         self.controller = controller
+        self.cpu_budget = cpu_budget
         self.progress = Progress(
             TextColumn("[progress.description]{task.description}"),
             BarColumn(),
@@ -17,37 +34,76 @@ class PlaybackDisplay:
             TimeRemainingColumn()
         )
         self.task = None
-        self._last_update = 0
-        self.update_interval = 0.05  # 50ms update interval
-        
-    def live_display(self):
-        status = "⏸ Paused" if self.controller.is_paused else "▶ Playing"
-        controls = "[dim]p: Play/Pause | a/d: ±1s | s/w: ±10s | q: Exit[/dim]"
-        
-        return Panel(
+        self._status = Text("", style="bold yellow")
+        self._meter = Text("")
+        self._panel = Panel(
             Group(
                 self.progress,
-                Text(status, style="bold yellow"),
-                Text(controls)
+                self._status,
+                self._meter,
+                Text.from_markup("[dim]p: Play/Pause | a/d: ±1s | s/w: ±10s | q: Exit[/dim]")
             ),
             title="[bold]Audio Playback[/bold]"
         )
-        
+        self._last_update = 0
+        self._last_level = -1
+        self.update_interval = self.MIN_INTERVAL
+        self.render_seconds = 0.0  # Total CPU time spent redrawing
+        self.renders = 0
+        self._render_cost = 0.0    # Smoothed CPU time of one redraw
+
+    def tick(self) -> float:
+        """Current redraw interval, for `playback_events(tick=...)`."""
+        return self.update_interval
+
+    def live_display(self):
+        return self._panel
+
     def update(self):
-        current_time = time.time()
-        if current_time - self._last_update < self.update_interval:
+        """Copy controller state into the panel's fields"""
+        status = "⏸ Paused" if self.controller.is_paused else "▶ Playing"
+        if self._status.plain != status:
+            self._status.plain = status
+        self._update_meter()
+
+        self.controller.update_progress()
+        if not self.controller.samplerate:
             return
-            
+        total_seconds = self.controller.total_frames / self.controller.samplerate
         if not self.task:
-            if not self.controller.samplerate:
-                return
-            total_seconds = self.controller.total_frames / self.controller.samplerate
             self.task = self.progress.add_task(
-                "Playing", 
+                "Playing",
                 total=total_seconds
             )
-        
-        if self.controller.samplerate:
-            current_seconds = self.controller.current_frame / self.controller.samplerate
-            self.progress.update(self.task, completed=current_seconds)
-            self._last_update = current_time
\ No newline at end of file
+
+        current_seconds = self.controller.current_frame / self.controller.samplerate
+        # Streamed audio grows while it plays, so the total is refreshed too
+        self.progress.update(self.task, total=total_seconds, completed=current_seconds)
+
+    def refresh(self, live: Live, force: bool = False):
+        """Update and redraw if the adaptive interval has passed (or `force`, for state changes)"""
+        now = time.perf_counter()
+        if not force and now - self._last_update < self.update_interval:
+            return
+        cpu = time.thread_time()
+        self.update()
+        live.refresh()
+        elapsed = time.thread_time() - cpu
+        self._last_update = now
+        self.render_seconds += elapsed
+        self.renders += 1
+        self._render_cost = elapsed if self.renders == 1 else 0.8 * self._render_cost + 0.2 * elapsed
+        # A redraw costing c seconds every i seconds uses c / i of the time
+        self.update_interval = min(self.MAX_INTERVAL, max(self.MIN_INTERVAL, self._render_cost / self.cpu_budget))
+
+    def _update_meter(self):
+        # -60..0 dBFS mapped onto the bar
+        rms = self.controller.output_level()
+        db = 20 * math.log10(rms) if rms > 1e-6 else -120.0
+        level = int(round(min(max((db + 60) / 60, 0.0), 1.0) * self.METER_WIDTH))
+        if level == self._last_level:
+            return
+        self._last_level = level
+        self._meter.plain = ""
+        self._meter.append("█" * level, style="green" if level < self.METER_WIDTH * 0.85 else "red")
+        self._meter.append("·" * (self.METER_WIDTH - level), style="dim")
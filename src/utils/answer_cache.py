@@ -0,0 +1,163 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from llama_index.core import Settings
+from config.config import ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """Semantic cache of answers, in front of the RAG path.
+
+    Questions are embedded with `Settings.embed_model`; a new question whose
+    cosine similarity to a cached one reaches `threshold` gets the stored
+    answer text and the path of its spoken audio. Each entry records the
+    hash of every note it cited (from `notes_state`, filename -> hash at
+    indexing time), and is dropped as soon as one of them changes.
+    Answers that cited nothing are tied to the whole notes collection.
+    Entries persist as JSON, least recently used evicted past `max_entries`;
+    the file is written by `store`, while changes made by lookups (use
+    times, stale entries dropped) wait for the next store or for exit.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        notes_state: Callable[[], Dict[str, str]],
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES
+    ):
+        self.path = path
+        self.notes_state = notes_state
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: List[Dict] = self._load()
+        self._matrix: Optional[np.ndarray] = None  # Normalized embeddings, rebuilt after changes
+        self._last: Optional[tuple] = None          # (question, embedding) of the last lookup
+        self._dirty = False
+        atexit.register(self.flush)
+
+    def lookup(self, question: str) -> Optional[Dict]:
+        """Cached entry ('answer', 'audio', 'similarity') for a question close enough to `question`."""
+        if self.threshold <= 0:
+            return None
+        vector = self._embed(question)
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+            similarities = self._embeddings() @ vector
+            best = int(np.argmax(similarities))
+            entry = self._entries[best]
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            if not self._current(entry):
+                logger.info(f"Cached answer to '{entry['question']}' is stale, dropping it")
+                self._remove(best)
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry['used'] = time.time()
+            self._dirty = True
+            return dict(entry, similarity=float(similarities[best]))
+
+    def store(self, question: str, answer: str, source_files: List[str], audio: Optional[str] = None):
+        """Cache `answer` to `question`, citing the notes in `source_files`."""
+        if self.threshold <= 0 or not answer.strip():
+            return
+        state = self.notes_state()
+        sources = {}
+        for name in set(filter(None, source_files)):
+            if name not in state:
+                return  # Cited a note the index does not know; nothing to validate against
+            sources[name] = state[name]
+        if not sources:
+            sources = {'*': self._fingerprint(state)}
+        vector = self._embed(question)
+        entry = {
+            'question': question,
+            'answer': answer,
+            'audio': audio,
+            'sources': sources,
+            'embedding': vector.tolist(),
+            'used': time.time()
+        }
+        with self._lock:
+            if self._entries:
+                similarities = self._embeddings() @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._remove(best)  # Replace the paraphrase it would have matched
+            self._entries.append(entry)
+            self._matrix = None
+            if len(self._entries) > self.max_entries:
+                oldest = min(range(len(self._entries)), key=lambda i: self._entries[i]['used'])
+                self._remove(oldest)
+            self._save()
+
+    def flush(self):
+        """Write changes made by lookups since the last store."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _embed(self, question: str) -> np.ndarray:
+        last = self._last
+        if last is not None and last[0] == question:
+            return last[1]
+        vector = np.asarray(Settings.embed_model.get_query_embedding(question), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        self._last = (question, vector)
+        return vector
+
+    def _embeddings(self) -> np.ndarray:
+        if self._matrix is None:
+            matrix = np.asarray([e['embedding'] for e in self._entries], dtype=np.float32)
+            self._matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return self._matrix
+
+    def _current(self, entry: Dict) -> bool:
+        state = self.notes_state()
+        for name, digest in entry['sources'].items():
+            current = self._fingerprint(state) if name == '*' else state.get(name)
+            if current != digest:
+                return False
+        return True
+
+    @staticmethod
+    def _fingerprint(state: Dict[str, str]) -> str:
+        return hashlib.md5(json.dumps(state, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _remove(self, index: int):
+        del self._entries[index]
+        self._matrix = None
+        self._dirty = True
+
+    def _load(self) -> List[Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Could not save answer cache: {e}")
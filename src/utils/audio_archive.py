@@ -0,0 +1,277 @@
+import json
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Dict, Optional
+import soundfile as sf
+from config.config import (
+    RECORDINGS_DIR,
+    VOICE_OUTPUTS_DIR,
+    RECORDINGS_ARCHIVE_CODEC,
+    RECORDINGS_MAX_MB,
+    RECORDINGS_MAX_AGE_DAYS,
+    VOICE_OUTPUTS_MAX_MB,
+    VOICE_OUTPUTS_MAX_AGE_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = ".archive_index.json"
+OPUS_RATES = {8000, 12000, 16000, 24000, 48000}
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.opus', '.mp3')
+
+
+class _ArchiveWorker:
+    """Single low-priority thread that runs all archive jobs."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="audio-archive", daemon=True)
+        self._thread.start()
+
+    def submit(self, job, *args):
+        self._queue.put((job, args))
+
+    def join(self):
+        """Block until every queued job has run."""
+        self._queue.join()
+
+    def _run(self):
+        try:
+            # Linux applies nice values per thread
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            job, args = self._queue.get()
+            try:
+                job(*args)
+            except Exception as e:
+                logger.error(f"Archive job failed: {e}")
+            finally:
+                self._queue.task_done()
+
+
+_worker: Optional[_ArchiveWorker] = None
+_worker_lock = threading.Lock()
+
+
+def _get_worker() -> _ArchiveWorker:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = _ArchiveWorker()
+        return _worker
+
+
+class AudioArchive:
+    """Quota-bounded store for one audio directory.
+
+    New audio is (re-)encoded to FLAC or Opus off the hot path, and a compact
+    JSON index (name -> size, created, last access) drives age limits and
+    least-recently-used eviction once the directory exceeds its size cap.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        max_age_days: float,
+        codec: Optional[str] = None
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.codec = codec  # 'flac', 'opus' or None to store files as-is
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, float]] = self._load_index()
+        self._worker = _get_worker()
+        self._worker.submit(self._scan)
+
+    # Public API (any thread)
+
+    def add_recording(self, recording):
+        """Encode an in-memory Recording straight to the archive codec."""
+        self._worker.submit(self._store_recording, recording)
+
+    def add_file(self, path: str):
+        """Register a file written into the directory, re-encoding WAV if configured."""
+        self._worker.submit(self._store_file, path)
+
+    def lookup(self, name: str) -> Optional[str]:
+        """Path of an archived file by name (extension-insensitive, so a WAV
+        re-encoded to FLAC is still found), marking it as used."""
+        stem = os.path.splitext(name)[0]
+        with self._lock:
+            entry = name if name in self._index else next(
+                (e for e in self._index if os.path.splitext(e)[0] == stem), None
+            )
+            if entry is None:
+                return None
+            self._index[entry]['a'] = time.time()
+            return os.path.join(self.directory, entry)
+
+    def touch(self, path: str):
+        """Record an access so LRU eviction keeps recently used files."""
+        name = os.path.basename(path)
+        with self._lock:
+            if name in self._index:
+                self._index[name]['a'] = time.time()
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return int(sum(e['s'] for e in self._index.values()))
+
+    # Worker-thread jobs
+
+    def _store_recording(self, recording):
+        codec = self._codec_for(recording.rate)
+        if codec is None:
+            path = recording.save(self.directory)
+        else:
+            stem = os.path.splitext(recording.filename)[0]
+            path = os.path.join(self.directory, stem + ('.flac' if codec == 'flac' else '.opus'))
+            self._encode(path, recording.samples, recording.rate, codec)
+            recording.path = path
+        self._register(path)
+        self._enforce_quotas()
+
+    def _store_file(self, path: str):
+        if self.codec and path.lower().endswith('.wav'):
+            path = self._reencode_wav(path)
+        self._register(path)
+        self._enforce_quotas()
+
+    def _scan(self):
+        """Adopt files created before the archive existed and drop vanished entries."""
+        now = time.time()
+        with self._lock:
+            for name in list(self._index):
+                if not os.path.exists(os.path.join(self.directory, name)):
+                    del self._index[name]
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not self._managed(name) or not os.path.isfile(path):
+                continue
+            if self.codec and name.lower().endswith('.wav') and now - os.path.getmtime(path) > 60:
+                path = self._reencode_wav(path)
+            self._register(path, known_only=True)
+        self._enforce_quotas()
+
+    def _reencode_wav(self, path: str) -> str:
+        try:
+            data, rate = sf.read(path, dtype='int16')
+            codec = self._codec_for(rate)
+            if codec is None:
+                return path
+            target = os.path.splitext(path)[0] + ('.flac' if codec == 'flac' else '.opus')
+            self._encode(target, data, rate, codec)
+            os.remove(path)
+            self._forget(os.path.basename(path))
+            return target
+        except Exception as e:
+            logger.error(f"Could not re-encode {path}: {e}")
+            return path
+
+    def _encode(self, path: str, samples, rate: int, codec: str):
+        tmp = path + ".part"
+        if codec == 'opus':
+            sf.write(tmp, samples, rate, format='OGG', subtype='OPUS')
+        else:
+            sf.write(tmp, samples, rate, format='FLAC', subtype='PCM_16')
+        os.replace(tmp, path)
+
+    def _codec_for(self, rate: int) -> Optional[str]:
+        if self.codec == 'opus' and rate not in OPUS_RATES:
+            return 'flac'  # libsndfile's Opus encoder only accepts Opus-native rates
+        return self.codec
+
+    def _managed(self, name: str) -> bool:
+        return name.lower().endswith(AUDIO_EXTENSIONS)
+
+    def _register(self, path: str, known_only: bool = False):
+        name = os.path.basename(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            if known_only and name in self._index:
+                self._index[name]['s'] = stat.st_size
+                return
+            self._index[name] = {'s': stat.st_size, 'c': stat.st_mtime, 'a': max(stat.st_atime, stat.st_mtime)}
+
+    def _forget(self, name: str):
+        with self._lock:
+            self._index.pop(name, None)
+
+    def _enforce_quotas(self):
+        now = time.time()
+        with self._lock:
+            expired = [n for n, e in self._index.items() if self.max_age and now - e['c'] > self.max_age]
+            survivors = sorted(
+                ((n, e) for n, e in self._index.items() if n not in expired),
+                key=lambda item: item[1]['a']
+            )
+            total = sum(e['s'] for _, e in survivors)
+            evicted = []
+            while survivors and self.max_bytes and total > self.max_bytes:
+                name, entry = survivors.pop(0)
+                total -= entry['s']
+                evicted.append(name)
+            for name in expired + evicted:
+                del self._index[name]
+        for name in expired + evicted:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        if expired or evicted:
+            logger.info(f"Archive {self.directory}: removed {len(expired)} expired, {len(evicted)} evicted")
+        self._save_index()
+
+    def _load_index(self) -> Dict[str, Dict[str, float]]:
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                logger.warning(f"Rebuilding unreadable archive index {self.index_path}")
+        return {}
+
+    def _save_index(self):
+        with self._lock:
+            data = json.dumps(self._index, separators=(',', ':'))
+        tmp = self.index_path + ".part"
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, self.index_path)
+
+
+_archives: Dict[str, AudioArchive] = {}
+
+
+def get_recordings_archive() -> AudioArchive:
+    if 'recordings' not in _archives:
+        _archives['recordings'] = AudioArchive(
+            RECORDINGS_DIR,
+            max_bytes=RECORDINGS_MAX_MB * 1024 * 1024,
+            max_age_days=RECORDINGS_MAX_AGE_DAYS,
+            codec=RECORDINGS_ARCHIVE_CODEC or None
+        )
+    return _archives['recordings']
+
+
+def get_voice_outputs_archive() -> AudioArchive:
+    """TTS outputs are already MP3, so they are kept as-is and only quota-managed."""
+    if 'voice_outputs' not in _archives:
+        _archives['voice_outputs'] = AudioArchive(
+            VOICE_OUTPUTS_DIR,
+            max_bytes=VOICE_OUTPUTS_MAX_MB * 1024 * 1024,
+            max_age_days=VOICE_OUTPUTS_MAX_AGE_DAYS
+        )
+    return _archives['voice_outputs']
@@ -0,0 +1,148 @@
+import re
+import logging
+from typing import Callable, Dict, List, Optional, Set
+from llama_index.core import Settings
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle, TextNode
+from config.config import RAG_CONTEXT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE = re.compile(r'(?<=[.!?…])\s+|\n{2,}')
+_WORD = re.compile(r'\w+')
+
+_tokenizer: Optional[Callable[[str], list]] = None
+
+
+def count_tokens(text: str) -> int:
+    """Prompt tokens in `text`, with LlamaIndex's tokenizer (~4 chars/token if it is unavailable)."""
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            _tokenizer = Settings.tokenizer
+        except Exception as e:
+            logger.debug(f"No tokenizer available ({e}), estimating tokens")
+            _tokenizer = lambda s: range((len(s) + 3) // 4)
+    return len(_tokenizer(text))
+
+
+def _normalize(sentence: str) -> str:
+    return " ".join(_WORD.findall(sentence.lower()))
+
+
+class ContextBudget(BaseNodePostprocessor):
+    """Assembles retrieved chunks into a context that fits a token budget.
+
+    Runs between retrieval and the LLM. Chunks are taken best score first;
+    sentences already sent in a better chunk (overlapping chunks, repeated
+    notes) are dropped. Chunks scoring below `low_value_ratio` of the best
+    one, and any chunk that no longer fits, are compressed to the
+    sentences sharing most words with the query; what still does not fit
+    is dropped. `last_report` holds the token counts of the last query
+    that went through retrieval; `clear_report` empties it before a query
+    that may not.
+    """
+
+    max_tokens: int = Field(default=RAG_CONTEXT_TOKENS)
+    low_value_ratio: float = Field(default=0.8)
+    min_chunk_tokens: int = Field(default=32)
+    _last_report: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextBudget"
+
+    @property
+    def last_report(self) -> Dict[str, int]:
+        return self._last_report
+
+    def clear_report(self):
+        self._last_report = {}
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None
+    ) -> List[NodeWithScore]:
+        # The retrieval query: query_str may also carry conversation history
+        query_words = set(_WORD.findall(" ".join(query_bundle.embedding_strs).lower())) if query_bundle else set()
+        ranked = sorted(nodes, key=lambda n: n.score or 0.0, reverse=True)
+        top_score = (ranked[0].score or 0.0) if ranked else 0.0
+
+        seen: Set[str] = set()
+        selected: List[NodeWithScore] = []
+        report = {'retrieved': len(nodes), 'kept': 0, 'compressed': 0, 'duplicates': 0, 'dropped': 0,
+                  'tokens_retrieved': 0, 'tokens_sent': 0}
+        budget = self.max_tokens
+        for position, node in enumerate(ranked):
+            text = node.node.get_content()
+            # Metadata is sent with the text and counts against the budget
+            overhead = count_tokens(node.node.get_content(metadata_mode=MetadataMode.LLM)) - count_tokens(text)
+            report['tokens_retrieved'] += overhead + count_tokens(text)
+
+            sentences = [s for s in (p.strip() for p in _SENTENCE.split(text)) if s]
+            fresh, keys = [], set()
+            for sentence in sentences:
+                key = _normalize(sentence)
+                if key not in seen and key not in keys:
+                    keys.add(key)
+                    fresh.append(sentence)
+            if not fresh:
+                report['duplicates'] += 1
+                continue
+            tokens = overhead + count_tokens(" ".join(fresh))
+
+            limit = budget
+            if (node.score or 0.0) < top_score * self.low_value_ratio:
+                limit = min(limit, overhead + max(self.min_chunk_tokens, (tokens - overhead) // 2))
+            if tokens > limit:
+                fresh = self._compress(fresh, query_words, limit - overhead)
+                if not fresh or limit - overhead < self.min_chunk_tokens:
+                    report['dropped'] += 1
+                    continue
+                tokens = overhead + count_tokens(" ".join(fresh))
+                report['compressed'] += 1
+
+            seen.update(_normalize(s) for s in fresh)
+            budget -= tokens
+            report['kept'] += 1
+            report['tokens_sent'] += tokens
+            if len(fresh) == len(sentences):
+                selected.append(node)
+            else:
+                trimmed = TextNode(
+                    text=" ".join(fresh),
+                    id_=node.node.node_id,
+                    metadata=node.node.metadata,
+                    excluded_llm_metadata_keys=node.node.excluded_llm_metadata_keys,
+                    excluded_embed_metadata_keys=node.node.excluded_embed_metadata_keys
+                )
+                selected.append(NodeWithScore(node=trimmed, score=node.score))
+            if budget < self.min_chunk_tokens:
+                report['dropped'] += len(ranked) - position - 1
+                break
+
+        self._last_report = report
+        logger.info(
+            f"Context: {report['kept']}/{report['retrieved']} chunks, "
+            f"{report['tokens_sent']}/{report['tokens_retrieved']} tokens sent "
+            f"({report['compressed']} compressed, {report['duplicates']} duplicate, {report['dropped']} dropped)"
+        )
+        return selected
+
+    @staticmethod
+    def _compress(sentences: List[str], query_words: Set[str], max_tokens: int) -> List[str]:
+        """Most query-relevant sentences that fit in `max_tokens`, in their original order."""
+        def relevance(i: int) -> tuple:
+            words = set(_WORD.findall(sentences[i].lower()))
+            return len(words & query_words), -i  # Earlier sentences win ties
+
+        keep = []
+        used = 0
+        for i in sorted(range(len(sentences)), key=relevance, reverse=True):
+            tokens = count_tokens(sentences[i])
+            if used + tokens <= max_tokens:
+                keep.append(i)
+                used += tokens
+        return [sentences[i] for i in sorted(keep)]
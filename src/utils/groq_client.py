@@ -0,0 +1,227 @@
+import json
+import re
+import threading
+import time
+import logging
+from typing import Dict, Optional
+import httpx
+from config.config import GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE
+from utils.request_policy import rate_limited
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_FORM_MODEL = re.compile(rb'name="model"\r\n\r\n([^\r]+)')
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset headers like '2m59.56s', '7.66s' or '250ms' into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = 0.0
+    matched = False
+    for amount, unit in _DURATION_PART.findall(value):
+        matched = True
+        amount = float(amount)
+        if unit == 'h':
+            seconds += amount * 3600
+        elif unit == 'm':
+            seconds += amount * 60
+        elif unit == 's':
+            seconds += amount
+        else:
+            seconds += amount / 1000
+    return seconds if matched else None
+
+
+class TokenBucket:
+    """Continuously refilling bucket; the capacity refills once per `period`."""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.period = period
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate if self.rate > 0 else 1.0
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """Adopt the per-minute limit and remaining amount reported by the API."""
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+            self.rate = limit / self.period
+        if remaining is not None:
+            self.level = min(self.level, remaining)
+
+
+class ModelLimits:
+    """Request and token buckets, and the 429 pause, of one Groq model."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.paused_until = 0.0
+
+
+class RateLimitScheduler:
+    """Paces Groq requests against the account's per-model request and token limits.
+
+    Groq limits each model separately, so every model gets its own
+    `ModelLimits`, keyed by the `model` in the request body (or the URL path
+    when the body is a multipart upload). Requests block in `acquire` until
+    both buckets have room, so concurrent callers queue up instead of racing
+    into 429s. The request bucket stays at the configured RPM, because the
+    `x-ratelimit-*-requests` headers count requests per day; the token
+    bucket is corrected from the `x-ratelimit-*-tokens` (per minute)
+    headers of every response. A 429 pauses that model's callers until the
+    server's `retry-after`.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = GROQ_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = GROQ_TOKENS_PER_MINUTE
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._models: Dict[str, ModelLimits] = {}
+        self._cond = threading.Condition()
+        self.throttled = 0  # Number of 429 responses seen
+
+    def limits(self, model: str) -> ModelLimits:
+        with self._cond:
+            if model not in self._models:
+                self._models[model] = ModelLimits(self.requests_per_minute, self.tokens_per_minute)
+            return self._models[model]
+
+    def acquire(self, model: str, tokens: int = 0):
+        """Block until a request to `model` estimated at `tokens` tokens may be sent."""
+        limits = self.limits(model)
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = max(
+                    limits.paused_until - now,
+                    limits.requests.wait_time(1, now),
+                    limits.tokens.wait_time(tokens, now)
+                )
+                if wait <= 0:
+                    limits.requests.take(1)
+                    limits.tokens.take(tokens)
+                    return
+                self._cond.wait(timeout=wait)
+
+    def update_from_headers(self, model: str, headers: httpx.Headers):
+        limits = self.limits(model)
+        limit = headers.get('x-ratelimit-limit-tokens')
+        remaining = headers.get('x-ratelimit-remaining-tokens')
+        with self._cond:
+            try:
+                limits.tokens.sync(
+                    float(limit) if limit else None,
+                    float(remaining) if remaining else None,
+                    time.monotonic()
+                )
+            except ValueError:
+                logger.debug("Ignoring malformed token rate-limit headers")
+            self._cond.notify_all()
+
+    def pause(self, model: str, seconds: float):
+        """Hold back every caller of `model` for `seconds` (used on 429)."""
+        limits = self.limits(model)
+        with self._cond:
+            limits.paused_until = max(limits.paused_until, time.monotonic() + seconds)
+            self.throttled += 1
+            self._cond.notify_all()
+
+    # httpx event hooks
+
+    def on_request(self, request: httpx.Request):
+        with rate_limited():
+            self.acquire(_request_model(request), _estimate_tokens(request))
+
+    def on_response(self, response: httpx.Response):
+        model = _request_model(response.request)
+        self.update_from_headers(model, response.headers)
+        if response.status_code == 429:
+            retry_after = _parse_reset(response.headers.get('retry-after')) or 1.0
+            logger.warning(f"Groq rate limit hit for {model}, pausing its requests for {retry_after:.1f}s")
+            self.pause(model, retry_after)
+
+
+def _request_model(request: httpx.Request) -> str:
+    """The model a request is for, or its URL path when the body can't be read (multipart uploads)."""
+    try:
+        body = request.content
+    except httpx.RequestNotRead:
+        return request.url.path
+    if body.startswith(b'{'):
+        try:
+            model = json.loads(body).get('model')
+        except ValueError:
+            model = None
+    else:
+        match = _FORM_MODEL.search(body)
+        model = match.group(1).decode('utf-8', 'replace') if match else None
+    return model or request.url.path
+
+
+def _estimate_tokens(request: httpx.Request) -> int:
+    """Rough prompt size (~4 bytes per token); audio uploads don't count toward TPM."""
+    if '/audio/' in request.url.path:
+        return 0
+    length = request.headers.get('content-length')
+    return int(length) // 4 if length and length.isdigit() else 0
+
+
+_client_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_scheduler: Optional[RateLimitScheduler] = None
+
+
+def get_scheduler() -> RateLimitScheduler:
+    global _scheduler
+    with _client_lock:
+        if _scheduler is None:
+            _scheduler = RateLimitScheduler()
+        return _scheduler
+
+
+def get_http_client() -> httpx.Client:
+    """Keep-alive HTTP client shared by every Groq SDK and LlamaIndex client."""
+    global _http_client
+    scheduler = get_scheduler()
+    with _client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=20,
+                    max_keepalive_connections=10,
+                    keepalive_expiry=120
+                ),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+                event_hooks={
+                    'request': [scheduler.on_request],
+                    'response': [scheduler.on_response]
+                }
+            )
+        return _http_client
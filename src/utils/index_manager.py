@@ -13,7 +13,11 @@ from llama_index.core import (
     Settings,
     Document
 )
+from llama_index.core.schema import MetadataMode
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from utils.context_budget import ContextBudget
+from utils.answer_cache import AnswerCache
+from config.config import RAG_SIMILARITY_TOP_K
 
 class IndexManager:
     def __init__(
@@ -29,6 +33,12 @@ class IndexManager:
         self.notes_state: Dict[str, str] = {}  # filename -> hash
         self.documents = []
         self.index = None
+        self.context_budget = ContextBudget()
+        # Answers to earlier questions, valid while the notes they cited are unchanged
+        self.answer_cache = AnswerCache(
+            os.path.join(persist_dir, "answer_cache.json"),
+            lambda: self.notes_state
+        )
         
         # Set global settings for LlamaIndex
         Settings.embed_model = HuggingFaceEmbedding(
@@ -225,12 +235,37 @@ class IndexManager:
             self.console.print(f"[red]Error creating index: {str(e)}[/red]")
             raise
 
-    def get_query_engine(self, llm):
-        """Get query engine from the current index."""
+    def get_query_engine(self, llm, streaming: bool = False, context_budget: Optional[ContextBudget] = None):
+        """Get query engine from the current index.
+
+        Retrieves `RAG_SIMILARITY_TOP_K` chunks and lets the context budget
+        pick what is sent to the LLM. With `streaming`, `query` returns a
+        StreamingResponse whose `response_gen` yields the answer token by
+        token. Background queries pass their own `context_budget`, so
+        `self.context_budget.last_report` stays the interactive turn's.
+        """
         if not self.index:
             self.console.print("[yellow]No index available. Please check if there are documents in the notes directory.[/yellow]")
             return None
-        return self.index.as_query_engine(llm=llm)
+        return self.index.as_query_engine(
+            llm=llm,
+            streaming=streaming,
+            similarity_top_k=RAG_SIMILARITY_TOP_K,
+            node_postprocessors=[context_budget or self.context_budget]
+        )
+
+    def node_embeddings(self, nodes) -> List[List[float]]:
+        """Embeddings of retrieved nodes, read from the vector store where it has them."""
+        store = self.index.vector_store if self.index else None
+        embeddings = []
+        for node in nodes:
+            try:
+                embeddings.append(store.get(node.node.node_id))
+            except Exception:
+                embeddings.append(Settings.embed_model.get_text_embedding(
+                    node.node.get_content(metadata_mode=MetadataMode.EMBED)
+                ))
+        return embeddings
 
     def refresh_index(self, directory_path: str) -> None:
         """Refresh the index with new documents."""
@@ -0,0 +1,265 @@
+import asyncio
+import random
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+from config.config import REQUEST_HEDGE_PERCENTILE
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class _Admission:
+    """When the rate limiter let the call's first request through, and whether one is queued now."""
+
+    def __init__(self):
+        self.at: Optional[float] = None
+        self.queued = False
+
+
+_admission: ContextVar[Optional[_Admission]] = ContextVar('request_admission', default=None)
+
+
+@contextmanager
+def rate_limited():
+    """Wrap a rate limiter's wait; the running policy's latency clock starts when it returns."""
+    admission = _admission.get()
+    if admission is None:
+        yield
+        return
+    admission.queued = True
+    try:
+        yield
+    finally:
+        admission.queued = False
+        if admission.at is None:
+            admission.at = time.monotonic()
+
+
+class CircuitOpenError(Exception):
+    """Raised when a service's circuit breaker is open and calls are short-circuited."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transient failures: retryable HTTP status, connection errors and timeouts.
+
+    Wrapped errors (e.g. from GroqLLMWrapper.chat) are judged by their `__cause__`.
+    """
+    while error is not None:
+        status = getattr(error, 'status_code', None)
+        if status is not None:
+            return status in RETRYABLE_STATUS
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        name = type(error).__name__
+        if 'Timeout' in name or 'Connection' in name:
+            return True
+        error = error.__cause__
+    return False
+
+
+def _discard(task: asyncio.Future):
+    """Release what a losing hedge returned: close it, or the token generator of a streaming response."""
+    if task.cancelled() or task.exception() is not None:
+        return
+    result = task.result()
+    close = getattr(result, 'close', None) or getattr(getattr(result, 'response_gen', None), 'close', None)
+    if callable(close):
+        close()
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)  # (monotonic time, seconds)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds))
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float, max_age: Optional[float] = None) -> Optional[float]:
+        """Latency percentile, over the samples of the last `max_age` seconds if given."""
+        cutoff = time.monotonic() - max_age if max_age is not None else None
+        with self._lock:
+            ordered = sorted(s for t, s in self._samples if cutoff is None or t >= cutoff)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures, half-open trial after a cool-down."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether a call would be let through now (closed, or due a half-open trial), without changing state."""
+        with self._lock:
+            return self.state != 'open' or time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half-open'
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = 'closed'
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half-open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning("Circuit breaker opened")
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+
+class RequestPolicy:
+    """Hedging, jittered exponential backoff and a circuit breaker around a blocking call.
+
+    Once enough latencies are known, a call still running past the
+    `hedge_percentile` latency gets a duplicate request; the first response
+    wins. Latency is counted from when the rate limiter admits the call's
+    first request (see `rate_limited`), and no hedge fires while a request
+    is queued, so pacing neither looks slow nor adds hedged load. A
+    blocking call can't be interrupted in its worker thread, so the loser
+    runs to completion in the background; its result is then discarded
+    and closed: its own `close`, or for a streaming response the close of
+    its `response_gen`, which unwinds the token generators down to the
+    HTTP stream.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        hedge_percentile: float = REQUEST_HEDGE_PERCENTILE,
+        min_samples: int = 20,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.name = name
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Latency after which a hedge is fired, or None while still warming up."""
+        if not self.hedge_percentile or len(self.latency) < self.min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` in a worker thread under this policy."""
+        for attempt in range(self.max_retries):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"{self.name} is temporarily unavailable")
+            try:
+                result = await self._hedged(fn, args, kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries - 1:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(f"{self.name} call failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _start(self, fn: Callable, args, kwargs):
+        """Run `fn` in a worker thread; returns its task and its `_Admission`."""
+        admission = _Admission()
+        token = _admission.set(admission)
+        try:
+            # The task copies the current context, so the worker sees `admission`
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+        finally:
+            _admission.reset(token)
+        return task, admission
+
+    async def _hedged(self, fn: Callable, args, kwargs):
+        started = time.monotonic()
+        primary, admission = self._start(fn, args, kwargs)
+
+        def elapsed() -> float:
+            return time.monotonic() - (admission.at or started)
+
+        delay = self.hedge_delay()
+        while True:
+            remaining = None if delay is None else max(0.0, delay - elapsed())
+            if remaining is not None and admission.queued:
+                remaining = delay  # Still waiting on the limiter: check again later
+            done, _ = await asyncio.wait({primary}, timeout=remaining)
+            if done:
+                result = primary.result()
+                self.latency.record(elapsed())
+                return result
+            if not admission.queued and elapsed() >= delay:
+                break
+
+        self.hedges_fired += 1
+        logger.info(f"{self.name} exceeded p{self.hedge_percentile:g} ({delay:.2f}s), hedging")
+        hedge, _ = self._start(fn, args, kwargs)
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedges_won += 1
+                        self.latency.record(elapsed())
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.add_done_callback(_discard)
+
+
+_policies: Dict[str, RequestPolicy] = {}
+
+
+def get_policy(name: str) -> RequestPolicy:
+    """Shared policy per service so latency history and breaker state are global."""
+    if name not in _policies:
+        _policies[name] = RequestPolicy(name)
+    return _policies[name]
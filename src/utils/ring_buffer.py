@@ -0,0 +1,102 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Preallocated single-producer/single-consumer ring buffer of audio frames.
+
+    The producer (typically a PortAudio callback) and the consumer never take
+    a lock: each side only advances its own monotonically increasing frame
+    counter, and the producer publishes its counter after the copy. When the
+    consumer falls more than `capacity` frames behind, the oldest audio is
+    overwritten and the lost frames are counted in `overflows`.
+    """
+
+    def __init__(self, capacity: int, channels: int = 1, dtype=np.int16):
+        self.capacity = int(capacity)
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self._buf = np.zeros((self.capacity, channels), dtype=self.dtype)
+        self._write_pos = 0  # Total frames ever written (producer only)
+        self._read_pos = 0   # Total frames ever consumed (consumer only)
+        self.overflows = 0   # Frames lost because the consumer fell behind
+
+    @property
+    def write_pos(self) -> int:
+        return self._write_pos
+
+    def available(self) -> int:
+        """Frames written but not yet consumed (capped at capacity)."""
+        return min(self._write_pos - self._read_pos, self.capacity)
+
+    def free(self) -> int:
+        return self.capacity - (self._write_pos - self._read_pos)
+
+    def write(self, data: np.ndarray, overwrite: bool = True) -> int:
+        """Copy frames in. Without `overwrite`, only as many frames as fit are written."""
+        data = np.asarray(data, dtype=self.dtype).reshape(-1, self.channels)
+        n = len(data)
+        if not overwrite:
+            n = min(n, self.free())
+            if n <= 0:
+                return 0
+            data = data[:n]
+        # Only the newest `capacity` frames of an oversized write can survive
+        kept = data[-self.capacity:]
+        start = (self._write_pos + n - len(kept)) % self.capacity
+        first = min(len(kept), self.capacity - start)
+        self._buf[start:start + first] = kept[:first]
+        self._buf[:len(kept) - first] = kept[first:]
+        self._write_pos += n
+        return n
+
+    def read(self, max_frames: int = None) -> np.ndarray:
+        """Consume up to `max_frames` frames (all available by default) as a copy."""
+        write_pos = self._write_pos
+        lag = write_pos - self._read_pos
+        if lag > self.capacity:
+            self.overflows += lag - self.capacity
+            self._read_pos = write_pos - self.capacity
+            lag = self.capacity
+        n = lag if max_frames is None else max(0, min(lag, max_frames))
+
+        start = self._read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.empty((n, self.channels), dtype=self.dtype)
+        out[:first] = self._buf[start:start + first]
+        out[first:] = self._buf[:n - first]
+
+        # Frames the producer overwrote while we were copying are stale
+        stale = min(n, self._write_pos - self.capacity - self._read_pos)
+        self._read_pos += n
+        if stale > 0:
+            self.overflows += stale
+            out = out[stale:]
+        return out
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Consume up to `len(out)` frames into `out` without allocating; returns frames copied.
+
+        Meant for real-time consumers whose producer never overwrites
+        (`write(..., overwrite=False)`), so no stale-frame check is needed.
+        """
+        n = min(self._write_pos - self._read_pos, len(out))
+        if n <= 0:
+            return 0
+        start = self._read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self._buf[start:start + first]
+        out[first:n] = self._buf[:n - first]
+        self._read_pos += n
+        return n
+
+    def skip_to(self, position: int):
+        """Consume everything written before `position` (a past `write_pos`)."""
+        self._read_pos = max(self._read_pos, min(position, self._write_pos))
+
+    def rewind(self, frames: int):
+        """Consume from `frames` before the newest frame (e.g. a pre-roll)."""
+        self._read_pos = max(0, self._write_pos - min(frames, self.capacity))
+
+    def clear(self):
+        """Drop everything not yet consumed."""
+        self._read_pos = self._write_pos
@@ -0,0 +1,247 @@
+import threading
+import logging
+from collections import OrderedDict, deque
+from typing import Callable, List, Optional
+import numpy as np
+from llama_index.core import Settings
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+from utils.context_budget import count_tokens
+from config.config import MEMORY_RECENT_TURNS, MEMORY_RECENT_TOKENS, MEMORY_SUMMARY_TOKENS, MEMORY_REUSE_SIMILARITY
+
+logger = logging.getLogger(__name__)
+
+# Share of the retrieval query given to the recent questions; the new question keeps the rest
+HISTORY_WEIGHT = 0.3
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an assistant about the user's notes. "
+    "Keep names, numbers, decisions and open questions; drop pleasantries. Answer in the conversation's "
+    "language with at most {words} words and nothing but the summary.\n\n"
+    "Current summary:\n{summary}\n\nNew turns:\n{turns}\n\nUpdated summary:"
+)
+
+
+class Turn:
+    def __init__(
+        self,
+        question: str,
+        answer: str,
+        nodes: Optional[List[NodeWithScore]] = None,
+        embedding: Optional[np.ndarray] = None
+    ):
+        self.question = question
+        self.answer = answer
+        self.nodes = nodes
+        self.embedding = embedding          # Normalized query embedding of the question
+        self.node_embeddings: Optional[np.ndarray] = None  # Normalized, of `nodes`, fetched on first use
+
+
+def _normalized(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _embed_nodes(nodes: List[NodeWithScore]) -> List[List[float]]:
+    return Settings.embed_model.get_text_embedding_batch(
+        [n.node.get_content(metadata_mode=MetadataMode.EMBED) for n in nodes]
+    )
+
+
+def _key(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+class SessionMemory:
+    """Conversation memory for a workflow session, bounded in tokens.
+
+    The last `recent_turns` turns (up to `recent_tokens`) are sent
+    verbatim; older turns are folded into a rolling summary of at most
+    `summary_tokens`, written by `llm` on a background thread so answering
+    never waits for it.
+
+    Retrieval runs on the question blended with the recent questions
+    (`HISTORY_WEIGHT`), so follow-ups find the notes the conversation is
+    about. It is skipped for a repeated question, and when the previous
+    turn's nodes score at least `reuse_similarity` against the new question,
+    which then reuses them. `node_embeddings` looks up the embeddings of
+    retrieved nodes (e.g. from the vector store); by default they are
+    computed with `Settings.embed_model`.
+    """
+
+    def __init__(
+        self,
+        llm=None,
+        recent_turns: int = MEMORY_RECENT_TURNS,
+        recent_tokens: int = MEMORY_RECENT_TOKENS,
+        summary_tokens: int = MEMORY_SUMMARY_TOKENS,
+        reuse_similarity: float = MEMORY_REUSE_SIMILARITY,
+        node_embeddings: Optional[Callable[[List[NodeWithScore]], List[List[float]]]] = None,
+        cache_size: int = 32
+    ):
+        self.llm = llm
+        self.recent_turns = recent_turns
+        self.recent_tokens = recent_tokens
+        self.summary_tokens = summary_tokens
+        self.reuse_similarity = reuse_similarity
+        self.node_embeddings = node_embeddings or _embed_nodes
+        self.cache_size = cache_size
+        self.summary = ""
+        self.retrieval_hits = 0
+        self.last_reused = False      # Whether the last `query` reused cached retrieval results
+        self.last_standalone = True   # Whether its nodes match the question without the conversation
+        self._turns: deque = deque()
+        self._retrievals: "OrderedDict[str, List[NodeWithScore]]" = OrderedDict()
+        self._pending: Optional[Turn] = None
+        self._lock = threading.Lock()
+        self._folding = False
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self._retrievals.clear()
+            self.summary = ""
+            self._pending = None
+
+    def query(self, engine, question: str):
+        """Answer `question` with `engine` (a RetrieverQueryEngine), in the context of the conversation."""
+        vector = self._embed(question)
+        with self._lock:
+            history = list(self._turns)[-self.recent_turns:]
+        history_vectors = [self._turn_embedding(t) for t in history]
+        retrieval_vector = vector
+        if history_vectors:
+            retrieval_vector = _normalized((1 - HISTORY_WEIGHT) * vector + HISTORY_WEIGHT * np.mean(history_vectors, axis=0))
+        bundle = QueryBundle(
+            query_str=self.prompt_for(question),
+            custom_embedding_strs=[question],
+            embedding=retrieval_vector.tolist()
+        )
+        turn = Turn(question, "", None, vector)
+        turn.nodes = self._cached_nodes(question, vector, history[-1] if history else None, turn)
+        reused = turn.nodes is not None
+        if not reused:
+            turn.nodes = engine.retrieve(bundle)
+        # Answers found only through the conversation must not be reused out of it
+        standalone = not history or self._similarity(turn, vector) >= self.reuse_similarity
+        # Hedged duplicates of this call run on other threads
+        with self._lock:
+            if not reused:
+                self._retrievals[_key(question)] = turn.nodes
+                while len(self._retrievals) > self.cache_size:
+                    self._retrievals.popitem(last=False)
+            self._pending = turn
+            self.last_reused = reused
+            self.last_standalone = standalone
+        return engine.synthesize(bundle, turn.nodes)
+
+    def add_turn(self, question: str, answer: str):
+        """Record the answer to the last `query` (or an unrelated exchange)."""
+        with self._lock:
+            pending = self._pending
+            if pending is not None and pending.question == question:
+                turn, self._pending = pending, None
+                turn.answer = answer
+            else:
+                turn = Turn(question, answer)
+            self._turns.append(turn)
+            fold = self._overflow() and not self._folding
+            self._folding = self._folding or fold
+        if fold:
+            threading.Thread(target=self._fold, name="memory-summary", daemon=True).start()
+
+    def prompt_for(self, question: str) -> str:
+        """The question with the conversation so far, or just the question on the first turn."""
+        with self._lock:
+            summary, turns = self.summary, list(self._turns)
+        if not summary and not turns:
+            return question
+        parts = []
+        if summary:
+            parts.append(f"Summary of the earlier conversation:\n{summary}")
+        if turns:
+            parts.append("Recent conversation:\n" + "\n".join(
+                f"User: {t.question}\nAssistant: {t.answer}" for t in turns
+            ))
+        parts.append(f"Current question (answer this one): {question}")
+        return "\n\n".join(parts)
+
+    def _embed(self, text: str) -> np.ndarray:
+        return _normalized(Settings.embed_model.get_query_embedding(text))
+
+    def _turn_embedding(self, turn: Turn) -> np.ndarray:
+        if turn.embedding is None:
+            turn.embedding = self._embed(turn.question)
+        return turn.embedding
+
+    def _similarity(self, turn: Turn, vector: np.ndarray) -> float:
+        """Best similarity of `turn`'s nodes to a query embedding."""
+        if not turn.nodes:
+            return 0.0
+        if turn.node_embeddings is None:
+            turn.node_embeddings = _normalized(self.node_embeddings(turn.nodes))
+        return float(np.max(turn.node_embeddings @ vector))
+
+    def _cached_nodes(
+        self,
+        question: str,
+        vector: np.ndarray,
+        previous: Optional[Turn],
+        turn: Turn
+    ) -> Optional[List[NodeWithScore]]:
+        with self._lock:
+            nodes = self._retrievals.get(_key(question))
+            if nodes is not None:
+                self._retrievals.move_to_end(_key(question))
+        if nodes is None and previous is not None and self._similarity(previous, vector) >= self.reuse_similarity:
+            nodes = previous.nodes
+            turn.node_embeddings = previous.node_embeddings
+        if nodes is not None:
+            with self._lock:
+                self.retrieval_hits += 1
+            logger.debug(f"Reusing retrieval for: {question}")
+        return nodes
+
+    def _overflow(self) -> bool:
+        if len(self._turns) > self.recent_turns:
+            return True
+        tokens = sum(count_tokens(t.question) + count_tokens(t.answer) for t in self._turns)
+        return len(self._turns) > 1 and tokens > self.recent_tokens
+
+    def _fold(self):
+        """Background thread: fold turns beyond the recent window into the summary."""
+        try:
+            while True:
+                with self._lock:
+                    if not self._overflow():
+                        return
+                    count = max(1, len(self._turns) - self.recent_turns)
+                    old, summary = list(self._turns)[:count], self.summary
+                summary = self._summarize(summary, old)
+                with self._lock:
+                    for _ in range(count):
+                        self._turns.popleft()
+                    self.summary = summary
+        finally:
+            with self._lock:
+                self._folding = False
+
+    def _summarize(self, summary: str, turns: List[Turn]) -> str:
+        words = int(self.summary_tokens * 0.7)
+        text = "\n".join(f"User: {t.question}\nAssistant: {t.answer}" for t in turns)
+        if self.llm is not None:
+            try:
+                prompt = SUMMARY_PROMPT.format(words=words, summary=summary or "(empty)", turns=text)
+                return self._trim(self.llm.complete(prompt).text.strip())
+            except Exception as e:
+                logger.warning(f"Conversation summary failed ({e}), keeping an extract")
+        # Extract: the questions asked, newest kept when over budget
+        extract = " ".join(filter(None, [summary] + [f"User asked: {t.question}" for t in turns]))
+        return self._trim(extract, keep_end=True)
+
+    def _trim(self, text: str, keep_end: bool = False) -> str:
+        if count_tokens(text) <= self.summary_tokens:
+            return text
+        words = text.split()
+        keep = int(self.summary_tokens * 0.7)
+        return " ".join(words[-keep:] if keep_end else words[:keep])
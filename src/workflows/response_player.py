@@ -0,0 +1,148 @@
+import asyncio
+import os
+from typing import AsyncIterator, Optional, Union
+from rich.console import Console, Group
+from rich.live import Live
+from rich.text import Text
+from tts.edge_tts_wrapper import EdgeTTSWrapper
+from tts.sentence_pipeline import SentencePipeline, stream_sentences
+from playback.playback_module import AudioController
+from ui.playback_ui import PlaybackDisplay
+from utils.audio_archive import get_voice_outputs_archive
+from config.config import TTS_PLAYBACK_MODE
+
+
+class ResponsePlayer:
+    """Speaks assistant responses with playback controls, shared by both workflows.
+
+    In 'stream' mode (the default) MP3 chunks from edge-tts are piped into
+    the audio controller as they arrive, sentence by sentence, so playback
+    starts with the first chunk instead of after the whole answer; with
+    `speak_stream` the first sentence is spoken while the LLM is still
+    generating the rest. 'file' mode synthesizes the complete answer to a
+    file before playing it.
+    """
+
+    def __init__(
+        self,
+        console: Console,
+        tts: EdgeTTSWrapper,
+        audio_controller: AudioController,
+        max_parallel: int = 3,
+        mode: str = TTS_PLAYBACK_MODE
+    ):
+        self.console = console
+        self.tts = tts
+        self.audio_controller = audio_controller
+        self.pipeline = SentencePipeline(tts, max_parallel=max_parallel)
+        self.mode = mode
+        self.last_audio_file: Optional[str] = None  # Saved audio of the last answer spoken to the end
+
+    async def speak(self, text: str):
+        """Speak `text`, then offer a replay unless playback was stopped with 'q'."""
+        await self._speak(text)
+
+    async def play_saved(self, text: str, audio_file: Optional[str]):
+        """Play an answer's saved audio, synthesizing `text` again if the file is gone."""
+        if audio_file:
+            # Found through the archive index, which also marks it as used for LRU eviction
+            audio_file = get_voice_outputs_archive().lookup(os.path.basename(audio_file)) or audio_file
+        if not audio_file or not os.path.exists(audio_file):
+            await self._speak(text)
+            return
+        controller = self.audio_controller
+        try:
+            await controller.play_audio(audio_file)
+            await self._show_playback()
+            if not controller.should_stop:
+                self.last_audio_file = audio_file
+                await self._offer_replay(audio_file)
+        finally:
+            controller.stop_all()
+
+    async def speak_stream(self, tokens: AsyncIterator[str]) -> str:
+        """Print and speak an answer while the LLM is still generating it; returns the full text.
+
+        In 'stream' mode each sentence goes to TTS as soon as it is complete,
+        and the text is shown above the playback panel as it arrives.
+        """
+        if self.mode == 'file':
+            # A file needs the whole answer, so only the printing is incremental
+            self.console.print("\n[green]Response:[/green] ", end="")
+            parts = []
+            async for token in tokens:
+                parts.append(token)
+                self.console.print(token, end="", markup=False, highlight=False)
+            self.console.print()
+            text = "".join(parts)
+            await self._speak(text)
+            return text
+
+        response = Text.from_markup("\n[green]Response:[/green] ")
+        prefix = len(response)
+
+        async def shown():
+            async for token in tokens:
+                response.append(token)
+                yield token
+
+        await self._speak(stream_sentences(shown()), header=response)
+        return response.plain[prefix:]
+
+    async def _speak(self, source: Union[str, AsyncIterator[str]], header: Optional[Text] = None):
+        controller = self.audio_controller
+        self.last_audio_file = None
+        try:
+            if self.mode == 'file':
+                audio_file = await self.tts.generate_audio(source)
+                await controller.play_audio(audio_file)
+                await self._show_playback()
+            else:
+                controller.start_streaming_playback()
+                feed = asyncio.create_task(self._feed(source))
+                await self._show_playback(header)
+                if controller.should_stop:
+                    feed.cancel()
+                    return
+                # Saved copy of the streamed audio, used for replay
+                audio_file = await feed
+                if audio_file:
+                    # Replay from the audio already decoded for playback
+                    controller.cache_stream(audio_file)
+
+            if audio_file and not controller.should_stop:
+                self.last_audio_file = audio_file
+                await self._offer_replay(audio_file)
+        finally:
+            controller.stop_all()
+
+    async def _offer_replay(self, audio_file: str):
+        self.console.print("\n[dim]Press 'r' to replay, or Enter to continue[/dim]")
+        response = await asyncio.get_event_loop().run_in_executor(None, input)
+
+        if response.lower() == 'r':
+            await self.audio_controller.play_audio(audio_file)
+            await self._show_playback()
+
+    async def _feed(self, source: Union[str, AsyncIterator[str]]):
+        """Stream synthesized sentences into the controller; returns the saved MP3 path."""
+        async def play_chunk(chunk: bytes):
+            # Writing to the decoder can block while it is ahead of playback
+            await asyncio.to_thread(self.audio_controller.add_audio_chunk, chunk)
+
+        try:
+            if isinstance(source, str):
+                return await self.pipeline.run(source, play_chunk)
+            return await self.pipeline.run_stream(source, play_chunk)
+        finally:
+            self.audio_controller.finish_streaming()
+
+    async def _show_playback(self, header: Optional[Text] = None):
+        """Redraw the playback panel on each playback event until playback ends."""
+        controller = self.audio_controller
+        display = PlaybackDisplay(controller)
+        renderable = Group(header, display.live_display()) if header is not None else display.live_display()
+
+        with Live(renderable, console=self.console, auto_refresh=False) as live:
+            async for event in controller.playback_events(tick=display.tick):
+                display.refresh(live, force=event != 'tick')
@@ -1,24 +1,36 @@
 from typing import Optional
 from rich.console import Console
 from rich.progress import Progress
-from rich.live import Live
 from llama_index.core.llms import ChatMessage
 from tts.edge_tts_wrapper import EdgeTTSWrapper
-from llm.groq_llm import GroqLLMWrapper
+from llm.groq_llm import GroqLLMWrapper, iterate_in_thread, prefetch_first
 from utils.index_manager import IndexManager
+from utils.session_memory import SessionMemory
+from utils.context_budget import ContextBudget
 from playback.playback_module import audio_controller
-from ui.playback_ui import PlaybackDisplay
+from workflows.response_player import ResponsePlayer
+from config.config import LLM_STREAMING, ANSWER_CACHE_WARM_FILE
 import os
 import asyncio
+import logging
+import threading
 from pynput import keyboard
 
+logger = logging.getLogger(__name__)
+
 class TextAssistantWorkflow:
     def __init__(self, index_manager: IndexManager):
         self.console = Console()
         self.tts = EdgeTTSWrapper()
         self.llm_wrapper = GroqLLMWrapper()
+        # Follow-up questions see earlier turns; the fastest model keeps the summary
         self.index_manager = index_manager
+        self.memory = SessionMemory(
+            self.llm_wrapper.get_llm(self.llm_wrapper.models[0]),
+            node_embeddings=index_manager.node_embeddings
+        )
         self.audio_controller = audio_controller
+        self.response_player = ResponsePlayer(self.console, self.tts, self.audio_controller)
         
         # Load system prompts
         self.system_prompt = self._load_prompt("system_prompt.md")
@@ -26,6 +38,11 @@ class TextAssistantWorkflow:
 
     async def process_text_input(self, text: str):
         try:
+            # Paraphrases of an earlier question reuse its answer and audio
+            if await self._answer_from_cache(text):
+                self.console.print("\n[dim]Press Enter for new interaction, or 'q' to quit[/dim]")
+                return
+
             # Query and LLM processing
             with Progress() as progress:
                 task = progress.add_task("[yellow]Processing query...", total=None)
@@ -41,44 +58,54 @@ class TextAssistantWorkflow:
                             self.console.print(f"\n[dim]{i}. From {quote['file']} (relevance: {quote['score']:.2f}):[/dim]")
                             self.console.print(f"[italic]{quote['text']}[/italic]")
                     
-                    # Get response using query engine
-                    query_engine = self.index_manager.get_query_engine(llm)
-                    if query_engine is None:
+                    # Get response using query engine, on the model routed for this query
+                    # (retried/hedged per model, failing over when one is degraded)
+                    if self.index_manager.index is None:
                         raise ValueError("No index available")
-                    rag_response = query_engine.query(text)
+
+                    def query(llm):
+                        engine = self.index_manager.get_query_engine(llm, streaming=LLM_STREAMING)
+                        response = self.memory.query(engine, text)
+                        if LLM_STREAMING:
+                            # Open the stream under the policy, so it is retried or failed over too
+                            response.response_gen = prefetch_first(response.response_gen)
+                        return response
+
+                    top_score = max((quote['score'] for quote in quotes), default=None)
+                    # Retrieval reused from the session skips the budget, so don't show an old report
+                    self.index_manager.context_budget.clear_report()
+                    rag_response = await self.llm_wrapper.run(text, query, retrieval_score=top_score)
+                    self.console.print(f"[dim]Model: {self.llm_wrapper.last_model}[/dim]")
+                    report = self.index_manager.context_budget.last_report
+                    if self.memory.last_reused:
+                        self.console.print("[dim]Context: reused from an earlier turn[/dim]")
+                    elif report:
+                        self.console.print(f"[dim]Context sent: {report['tokens_sent']} of {report['tokens_retrieved']} tokens from {report['kept']}/{report['retrieved']} chunks[/dim]")
                     progress.update(task, completed=True)
-                    
-                    # Process response
-                    response_text = str(rag_response)
-                    self.console.print(f"\n[green]Response:[/green] {response_text}")
-                    
+
                     # Stop query progress before audio playback
                     progress.stop()
-                    
-                    # Convert to speech
-                    audio_file = await self.tts.generate_audio(response_text)
-                    if audio_file:
+
+                    if LLM_STREAMING:
+                        # Print and speak the answer while it is still being generated
+                        try:
+                            response_text = await self.response_player.speak_stream(iterate_in_thread(rag_response.response_gen))
+                            self.memory.add_turn(text, response_text)
+                            self._cache_answer(text, response_text, rag_response)
+                        except Exception as e:
+                            self.console.print(f"[red]Error streaming response: {str(e)}[/red]")
+                    else:
+                        response_text = str(rag_response)
+                        self.console.print(f"\n[green]Response:[/green] {response_text}")
+                        self.memory.add_turn(text, response_text)
+
+                        # Speak the response, starting with the first synthesized sentence
                         try:
-                            await self.audio_controller.play_audio(audio_file)
-                            display = PlaybackDisplay(self.audio_controller)
-                            
-                            with Live(display.live_display(), refresh_per_second=20) as live:
-                                while self.audio_controller.is_playing and not self.audio_controller.should_stop:
-                                    display.update()
-                                    live.update(display.live_display())
-                                    await asyncio.sleep(0.05)
-                                
-                                # Only show replay option if playback wasn't stopped with 'q'
-                                if not self.audio_controller.should_stop:
-                                    self.console.print("\n[dim]Press 'r' to replay, or Enter to continue[/dim]")
-                                    response = await asyncio.get_event_loop().run_in_executor(None, input)
-                                    
-                                    if response.lower() == 'r':
-                                        await self.audio_controller.play_audio(audio_file)
+                            await self.response_player.speak(response_text)
                         except Exception as e:
                             self.console.print(f"[red]Error playing audio: {str(e)}[/red]")
-                        finally:
-                            self.audio_controller.stop_all()
+                        self._cache_answer(text, response_text, rag_response)
+
                 except Exception as e:
                     progress.update(task, completed=True)
                     self.console.print(f"[red]Error processing query: {str(e)}[/red]")
@@ -91,6 +118,73 @@ class TextAssistantWorkflow:
             
         self.console.print("\n[dim]Press Enter for new interaction, or 'q' to quit[/dim]")
 
+    def start_cache_warmup(self, path: str = ANSWER_CACHE_WARM_FILE) -> Optional[threading.Thread]:
+        """Answer the common questions listed in `path` on a background thread,
+        so asking any of them, in any wording, is served from the answer cache.
+        Off unless ANSWER_CACHE_WARM_FILE is set."""
+        if not path or not os.path.exists(path) or self.index_manager.index is None:
+            return None
+        with open(path, "r", encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+        # The main loop blocks on input(), so the warm-up gets its own event loop
+        thread = threading.Thread(
+            target=asyncio.run, args=(self._warm_answer_cache(questions),), name="answer-cache-warmup", daemon=True
+        )
+        thread.start()
+        return thread
+
+    async def _warm_answer_cache(self, questions):
+        cache = self.index_manager.answer_cache
+        # Its own budget, so the warm-up doesn't overwrite the report shown for interactive turns
+        context_budget = ContextBudget()
+        for question in questions:
+            try:
+                if cache.lookup(question) is not None:
+                    continue
+
+                def query(llm):
+                    return self.index_manager.get_query_engine(llm, context_budget=context_budget).query(question)
+
+                response = await self.llm_wrapper.run(question, query)
+                answer = str(response)
+                audio_file = await self.tts.generate_audio(answer)
+                sources = [node.metadata.get('file_name') for node in response.source_nodes]
+                cache.store(question, answer, sources, audio_file)
+                logger.info(f"Pre-answered: {question}")
+            except Exception as e:
+                logger.warning(f"Could not pre-answer '{question}': {e}")
+
+    async def _answer_from_cache(self, text: str) -> bool:
+        """Replay the stored answer to an earlier question asked in other words, if there is one."""
+        try:
+            cached = self.index_manager.answer_cache.lookup(text)
+        except Exception as e:
+            self.console.print(f"[yellow]Warning: answer cache unavailable: {str(e)}[/yellow]")
+            return False
+        if cached is None:
+            return False
+        self.console.print(f"\n[dim]Answer from cache (similarity {cached['similarity']:.2f} to: {cached['question']})[/dim]")
+        self.console.print(f"\n[green]Response:[/green] {cached['answer']}")
+        self.memory.add_turn(text, cached['answer'])
+        try:
+            await self.response_player.play_saved(cached['answer'], cached['audio'])
+        except Exception as e:
+            self.console.print(f"[red]Error playing audio: {str(e)}[/red]")
+        return True
+
+    def _cache_answer(self, text: str, response_text: str, rag_response):
+        """Keep an answer that was spoken to the end, with the notes it cited."""
+        if not self.memory.last_standalone:
+            return  # Found through the conversation, so it depends on it
+        audio_file = self.response_player.last_audio_file
+        if audio_file is None:
+            return  # Stopped or failed early, the answer may be partial
+        sources = [node.metadata.get('file_name') for node in rag_response.source_nodes]
+        try:
+            self.index_manager.answer_cache.store(text, response_text, sources, audio_file)
+        except Exception as e:
+            self.console.print(f"[yellow]Warning: could not cache answer: {str(e)}[/yellow]")
+
     def _load_prompt(self, filename: str) -> str:
         prompt_path = os.path.join("src", "prompts", filename)
         try: